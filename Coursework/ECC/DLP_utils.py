@@ -0,0 +1,1583 @@
+# %%
+"""
+# Discrete Logarithm Solvers
+Find k such that Q = kP for points on an ECC curve
+"""
+# %%
+import json
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import sqlite3
+import time
+from queue import Empty
+
+from ECC_utils import Point, INFINITY, inverseModp, factorise, crt
+# %%
+"""
+# Pollard Rho walks
+A walk is a function f(X, c, d) -> (X', c', d') that keeps X = cP + dQ
+"""
+# %%
+def inc_mod_p(x, p):
+    return (x + 1) % p
+def double_mod_p(x, p):
+    return (2*x) % p
+
+
+def partition_walk(E, P, Q, n):
+    """
+    The classic walk which partitions the curve into three sets by x mod 3
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+
+    Returns:
+    function: f(X, c, d), the next point and coefficients
+    """
+    def f(X, c, d):
+        """
+        Function for transforming an EC Point (X = c_i * P + d_i * Q) to a new, random-looking EC Point (c_i+1 * P + d_i+1 * Q)
+
+        Parameters:
+        X (Point): The point
+        c (int): c s.t. X = cP + dQ
+        d (int): d s.t. X = cP + dQ
+
+        Returns:
+        Point: The new point, X_i+1 = X_i + P or 2*X_i or X_i + Q
+        int: c_i+1, after the transformation is applied
+        int: c_i+1, after the transformation is applied
+        """
+        partition = 0 if X is INFINITY else X.x % 3
+        if partition == 0:
+            return E.ECPointAddition(X, P), inc_mod_p(c, n), d
+        if partition == 1:
+            return E.ECPointDoubling(X), double_mod_p(c, n), double_mod_p(d, n)
+        if partition == 2:
+            return E.ECPointAddition(X, Q), c, inc_mod_p(d, n)
+    return f
+
+
+# Odd 64 bit multiplier for the multiplicative hash picking a walk branch
+WALK_HASH = 0x9E3779B97F4A7C15
+
+
+def walk_index(X, r):
+    """
+    Hash a point to one of r branches of a walk, mixing all of the bits of
+    x rather than just the lowest ones
+    """
+    if X is INFINITY:
+        return 0
+    return ((X.x * WALK_HASH) >> 40) % r
+
+
+def adding_walk_steps(E, P, Q, n, r=16, rng=random):
+    """
+    The random steps (R_j, a_j, b_j) with R_j = a_j P + b_j Q of an
+    r-adding walk. Walks that should merge when they meet, e.g. in
+    different processes, must share the same steps
+    """
+    steps = []
+    for _ in range(r):
+        a_j = rng.randrange(1, n)
+        b_j = rng.randrange(1, n)
+        steps.append((E.multi_scalar_mult([(a_j, P), (b_j, Q)]), a_j, b_j))
+    return steps
+
+
+def adding_walk(E, P, Q, n, r=16, rng=random, steps=None):
+    """
+    Teske's r-adding walk, X is sent to X + R_j for one of r precomputed
+    random points R_j = a_j P + b_j Q, chosen by hashing X. It behaves much
+    more like a random walk than the three way partition and never doubles
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+    r (int): The number of branches
+    rng (random.Random): Source of the random a_j, b_j
+    steps (list): Steps from adding_walk_steps, instead of new ones
+
+    Returns:
+    function: f(X, c, d), the next point and coefficients
+    """
+    if steps is None:
+        steps = adding_walk_steps(E, P, Q, n, r, rng)
+    r = len(steps)
+
+    def f(X, c, d):
+        R_j, a_j, b_j = steps[walk_index(X, r)]
+        return E.ECPointAddition(X, R_j), (c + a_j) % n, (d + b_j) % n
+    return f
+
+
+def canonical(E, X, c, d, n):
+    """
+    The representative of {X, -X} with the smaller y, with the signs of c
+    and d changed to match if X had to be negated. c and d come back
+    reduced mod n either way, so they stay small along the walk
+    """
+    if X is INFINITY or 2 * X.y <= E.p:
+        return X, c % n, d % n
+    return Point(X.x, E.p - X.y), (-c) % n, (-d) % n
+
+
+def negation_walk(E, P, Q, n, r=32, rng=random, steps=None):
+    """
+    An r-adding walk on the classes {X, -X}, which roughly halves the
+    space to search and so needs sqrt(2) times fewer steps. After each
+    step X is replaced by its canonical representative.
+
+    A step which lands back in the branch it was taken from would be
+    undone by the next step (a fruitless 2-cycle), so the walk looks ahead
+    and takes the next branch instead
+
+    Returns:
+    function: f(X, c, d), the next canonical point and coefficients
+    """
+    if steps is None:
+        steps = adding_walk_steps(E, P, Q, n, r, rng)
+    r = len(steps)
+
+    def f(X, c, d):
+        j = walk_index(X, r)
+        for t in range(r):
+            R_j, a_j, b_j = steps[(j + t) % r]
+            Y, c_, d_ = canonical(E, E.ECPointAddition(X, R_j), c + a_j, d + b_j, n)
+            if walk_index(Y, r) != (j + t) % r:
+                break
+        return Y, c_, d_
+    return f
+
+
+def make_walk(E, P, Q, n, walk='partition', r=16):
+    """
+    Build the walk named by `walk`, 'partition', 'adding' or 'negation'
+    (with r branches)
+    """
+    if walk == 'partition':
+        return partition_walk(E, P, Q, n)
+    if walk == 'adding':
+        return adding_walk(E, P, Q, n, r)
+    if walk == 'negation':
+        return negation_walk(E, P, Q, n, r)
+    raise ValueError(f"Unknown walk '{walk}'")
+# %%
+"""
+# Cycle detection
+Each takes a walk f and a starting point X = cP + dQ and returns two
+different representations c, d, c_, d_ of the point where the walk collides
+"""
+# %%
+def floyd_collision(f, X, c, d):
+    """
+    Floyd's tortoise and hare, three evaluations of f per step
+    """
+    X_, c_, d_ = f(X, c, d)
+
+    while X != X_:
+        X, c, d = f(X, c, d)
+
+        X_inter, c_inter, d_inter = f(X_, c_, d_)
+        X_, c_, d_ = f(X_inter, c_inter, d_inter)
+    return c, d, c_, d_
+
+
+def brent_collision(f, X, c, d):
+    """
+    Brent's cycle detection, the tortoise waits at the hare's position at
+    every power of two, so there is one evaluation of f per step
+    """
+    power = lam = 1
+    X_, c_, d_ = f(X, c, d)
+
+    while X != X_:
+        if power == lam:
+            X, c, d = X_, c_, d_
+            power *= 2
+            lam = 0
+        X_, c_, d_ = f(X_, c_, d_)
+        lam += 1
+    return c, d, c_, d_
+
+
+def nivasch_collision(f, X, c, d):
+    """
+    Nivasch's stack algorithm, keeps a stack of increasing points and
+    stops the first time the minimum of the cycle comes round again
+    """
+    stack = []
+    while True:
+        key = (-1, -1) if X is INFINITY else X
+        while stack and stack[-1][0] > key:
+            stack.pop()
+        if stack and stack[-1][0] == key:
+            _, c_, d_ = stack[-1]
+            return c_, d_, c, d
+        stack.append((key, c, d))
+        X, c, d = f(X, c, d)
+
+
+CYCLE_FINDERS = {
+    'floyd': floyd_collision,
+    'brent': brent_collision,
+    'nivasch': nivasch_collision,
+}
+
+# Evaluations of f for each step the tortoise takes
+CYCLE_EVALUATIONS = {
+    'floyd': 3,
+    'brent': 1,
+    'nivasch': 1,
+}
+# %%
+"""
+# Progress monitoring
+"""
+# %%
+class RhoMonitor():
+    def __init__(self, n, callback=None, filename=None, interval=10, negation=False,
+                 check_every=1024):
+        """
+        Counts the work done by a Pollard Rho run, steps, point additions
+        and doublings, inversions and distinguished points, and reports it
+        every `interval` seconds with the step rate and the time left
+        until the sqrt(pi n / 2) steps a collision is expected after.
+
+        Each report is a dict passed to `callback` and/or written as a line
+        of JSON to `filename`, or printed if neither is given. The clock is
+        only read every `check_every` steps, so counting costs little more
+        than incrementing a counter per step. Solvers only count when given
+        a monitor, without one they run exactly as before
+
+        Parameters:
+        n (int): The order of P
+        callback (function): Called with each report
+        filename (str): JSON lines file the reports are appended to
+        interval (int): Seconds between reports
+        negation (bool): Expect sqrt(pi n / 4) steps, for the negation map
+        check_every (int): Steps between looks at the clock
+
+        Returns:
+        RhoMonitor: The monitor, to pass to a solver
+        """
+        self.expected = math.sqrt(math.pi * n / (4 if negation else 2))
+        self.callback = callback
+        self.filename = filename
+        self.interval = interval
+        self.check_every = check_every
+        self.steps = self.adds = self.doubles = self.inversions = self.dps = 0
+        # Steps done before a resumed run started, left out of the rate
+        self.resumed = 0
+        # Functions handing over counts kept elsewhere, see monitored_walk
+        self.sources = []
+        self.next_check = check_every
+        self.start = self.last = time.monotonic()
+
+    def count(self, steps, adds=0, doubles=0, inversions=0):
+        """
+        Add the work of one or more steps, reporting if it is time to
+        """
+        self.steps += steps
+        self.adds += adds
+        self.doubles += doubles
+        self.inversions += inversions
+        if self.steps >= self.next_check:
+            self.next_check = self.steps + self.check_every
+            if time.monotonic() - self.last >= self.interval:
+                self.emit()
+
+    def found(self):
+        """
+        Count a distinguished point
+        """
+        self.dps += 1
+
+    def resume(self, steps):
+        """
+        Carry on from the steps of an interrupted run
+        """
+        self.steps = self.resumed = steps
+        self.next_check = steps + self.check_every
+
+    def report(self, done=False):
+        """
+        The counts so far, the step rate, progress as a fraction of the
+        expected steps and the seconds left until then (eta)
+        """
+        for flush in self.sources:
+            flush()
+        elapsed = time.monotonic() - self.start
+        rate = (self.steps - self.resumed) / elapsed if elapsed > 0 else 0.0
+        left = max(self.expected - self.steps, 0)
+        return {
+            'elapsed': elapsed,
+            'steps': self.steps,
+            'adds': self.adds,
+            'doubles': self.doubles,
+            'inversions': self.inversions,
+            'dps': self.dps,
+            'rate': rate,
+            'expected': self.expected,
+            'progress': self.steps / self.expected,
+            'eta': left / rate if rate else None,
+            'done': done,
+        }
+
+    def emit(self, done=False):
+        record = self.report(done)
+        self.last = time.monotonic()
+        if self.callback:
+            self.callback(record)
+        if self.filename:
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        if not self.callback and not self.filename:
+            eta = 'unknown' if record['eta'] is None else f"{record['eta']:.0f}s"
+            print(f"{record['steps']} steps, {record['progress']:.0%} of expected, "
+                  f"{record['rate']:.0f} steps/s, {record['dps']} distinguished points, ETA {eta}")
+
+    def finish(self):
+        """
+        Send a last report, marked done
+        """
+        self.emit(done=True)
+
+
+def monitored_walk(f, monitor, walk, evaluations=1):
+    """
+    Wrap the walk f so that its evaluations are counted, as one addition
+    or, for x = 1 mod 3 in the partition walk, one doubling, each with an
+    inversion. Look-ahead in the negation walk is not counted. A step is
+    counted for every `evaluations` evaluations, the cost of one step of
+    the cycle finder, so progress is measured in steps of the walk. The
+    counts are kept here and handed to the monitor every check_every
+    evaluations and whenever it reports, which keeps the cost per
+    evaluation to a counter
+    """
+    steps = doubles = 0
+    # Evaluations handed over so far and the steps counted for them
+    total = reported = 0
+    every = monitor.check_every
+
+    def flush():
+        nonlocal steps, doubles, total, reported
+        if steps:
+            # Reset first, as count may report and so call flush again
+            counted, doubled = steps, doubles
+            steps = doubles = 0
+            total += counted
+            walked = total // evaluations - reported
+            reported += walked
+            monitor.count(walked, counted - doubled, doubled, counted)
+
+    if walk == 'partition':
+        def g(X, c, d):
+            nonlocal steps, doubles
+            steps += 1
+            if X is not INFINITY and X.x % 3 == 1:
+                doubles += 1
+            if steps == every:
+                flush()
+            return f(X, c, d)
+    else:
+        def g(X, c, d):
+            nonlocal steps
+            steps += 1
+            if steps == every:
+                flush()
+            return f(X, c, d)
+    monitor.sources.append(flush)
+    return g
+# %%
+"""
+# Basic and Full Pollard Rho
+"""
+# %%
+def basicPollardRho(E, P, Q, n, cycle='floyd', walk='partition', r=16, monitor=None):
+    """
+    Function for finding a collision
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = lP
+    n (int): The order of P
+    cycle (str): The cycle detection, 'floyd', 'brent' or 'nivasch'
+    walk (str): The walk, 'partition' (x mod 3), 'adding' (r-adding) or
+        'negation' (r-adding on {X, -X}, leaving fruitless cycles)
+    r (int): The number of branches of the r-adding walk
+    monitor (RhoMonitor): Counts the steps of the cycle finder, and every
+        evaluation of the walk as its additions and inversions
+
+    Returns:
+    int, int, int, int: c, d, c_, d_ s.t cP + dQ = c_P + d_Q
+    """
+    if cycle not in CYCLE_FINDERS:
+        raise ValueError(f"Unknown cycle detection '{cycle}'")
+    f = make_walk(E, P, Q, n, walk, r)
+    if monitor is not None:
+        f = monitored_walk(f, monitor, walk, CYCLE_EVALUATIONS[cycle])
+
+    c = random.randint(1, n-1)
+    d = random.randint(1, n-1)
+    X = E.multi_scalar_mult([(c, P), (d, Q)])
+
+    if walk == 'negation':
+        X, c, d = canonical(E, X, c, d, n)
+
+    c, d, c_, d_ = CYCLE_FINDERS[cycle](f, X, c, d)
+    # The negation walk can fall into a fruitless cycle, which comes back
+    # to the same point with the same coefficients, so leave it and go on.
+    # Fruitless cycles can also lead into each other, which shows up as an
+    # exit point being reached again
+    exits = {}
+    while walk == 'negation' and (d - d_) % n == 0:
+        X, c, d = _leave_fruitless_cycle(E, P, Q, n, f, c, d)
+        if X in exits:
+            c_, d_ = exits[X]
+            if (d - d_) % n:
+                break
+            X, c, d = _random_start(E, P, Q, n)
+        exits[X] = (c, d)
+        c, d, c_, d_ = CYCLE_FINDERS[cycle](f, X, c, d)
+
+    assert E.multi_scalar_mult([(c, P), (d, Q)]) == E.multi_scalar_mult([(c_, P), (d_, Q)])
+    if monitor is not None:
+        monitor.finish()
+    return c, d, c_, d_
+
+
+def _leave_fruitless_cycle(E, P, Q, n, f, c, d, max_length=64):
+    """
+    The point after a fruitless cycle through cP + dQ, found by going once
+    round it and doubling out of its smallest point as in _escape_cycle,
+    or a new random start if it does not close within max_length steps
+    """
+    X = E.multi_scalar_mult([(c, P), (d, Q)])
+    cycle = [(X, c, d)]
+    Y, c_, d_ = f(X, c, d)
+    while Y != X and len(cycle) < max_length:
+        cycle.append((Y, c_, d_))
+        Y, c_, d_ = f(Y, c_, d_)
+    if Y == X:
+        return _escape_cycle(E, cycle, n)
+    return _random_start(E, P, Q, n)
+
+
+def _random_start(E, P, Q, n):
+    """
+    A random canonical starting point for the negation walk
+    """
+    c = random.randint(1, n-1)
+    d = random.randint(1, n-1)
+    return canonical(E, E.multi_scalar_mult([(c, P), (d, Q)]), c, d, n)
+
+
+def fullPollardRho(E, P, Q, n, c, d, c_, d_):
+    '''
+    Function for finding the discrete log Q = kP from a collision X = c*P + d*Q = X_ = c_*P + d_*Q
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+
+    Returns:
+    int: k s.t. Q = kP
+    '''
+    if (d_ - d) % n == 0:
+        # cP + dQ = c_P + d_Q holds for every k, so it says nothing
+        print("Failure: d = d' mod n, the collision is useless")
+        return None
+
+    gcd = math.gcd( (d_ - d), n ) # why do we do this for n, not n-1
+
+    if gcd == 1:
+        k = (c-c_) * inverseModp(d_-d, n) % n
+        return int(k)
+    else:
+        # k(d_ - d) = c - c_ mod n only has solutions if gcd | c - c_, and
+        # then they are k1 + i*n/gcd for k1 the solution mod n/gcd
+        print(f"gcd={gcd}")
+        if (c - c_) % gcd == 0:
+            m = n // gcd
+            k1 = (c - c_) // gcd * inverseModp((d_ - d) // gcd % m, m) % m
+            # Step through the candidates kP by adding mP, one addition each
+            X = E.ECPointMult(k1, P)
+            step = E.ECPointMult(m, P)
+            for i in range(gcd):
+                if X == Q:
+                    return k1 + i * m
+                X = E.ECPointAddition(X, step)
+        print(f"Failure")
+# %%
+"""
+# Distinguished point store
+"""
+# %%
+class DistinguishedPointStore():
+    def __init__(self, filename, p, n, batch=1024, timeout=60):
+        """
+        A table of distinguished points kept in an SQLite file, for runs
+        with more points than fit in a dict, that have to survive a restart
+        or that several processes add to at once. Points are keyed by their
+        compressed encoding, the parity of y then x, and (c, d) are packed
+        into a fixed width record alongside an optional integer tag.
+
+        It can be used in place of a dict: table.get(X), X in table,
+        table[X], table[X] = (c, d) or (c, d, tag) and len(table).
+        New points are buffered and written `batch` at a time in a single
+        transaction, so other processes only see them after a flush. The
+        file is in WAL mode so reading never blocks writing, and a process
+        waits up to `timeout` seconds for another's write to finish
+
+        Parameters:
+        filename (str): The SQLite file, created if it does not exist
+        p (int): The field prime, which sets the size of x in the key
+        n (int): Above every c and d, which sets the record size
+        batch (int): New points buffered before they are written
+        timeout (int): Seconds to wait for another process's write
+
+        Returns:
+        DistinguishedPointStore: The store
+        """
+        self.filename = filename
+        self.p = p
+        self.n = n
+        self.batch = batch
+        self.timeout = timeout
+        self.key_width = (p.bit_length() + 7) // 8
+        self.width = (n.bit_length() + 7) // 8
+        # {key: (record, tag)} waiting to be written
+        self.pending = {}
+        # (value, stored value) for points another process wrote first
+        self.conflicts = []
+        self._connect()
+
+    def _connect(self):
+        self.db = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS points '
+                        '(key BLOB PRIMARY KEY, record BLOB NOT NULL, tag INTEGER) WITHOUT ROWID')
+
+    def _key(self, X):
+        return bytes([2 | (X.y & 1)]) + X.x.to_bytes(self.key_width, 'big')
+
+    def _pack(self, value):
+        record = value[0].to_bytes(self.width, 'big') + value[1].to_bytes(self.width, 'big')
+        return record, value[2] if len(value) > 2 else None
+
+    def _unpack(self, record, tag):
+        c = int.from_bytes(record[:self.width], 'big')
+        d = int.from_bytes(record[self.width:], 'big')
+        return (c, d) if tag is None else (c, d, tag)
+
+    def get(self, X, default=None):
+        """
+        The (c, d) or (c, d, tag) stored for X, or default
+        """
+        key = self._key(X)
+        if key in self.pending:
+            return self._unpack(*self.pending[key])
+        row = self.db.execute('SELECT record, tag FROM points WHERE key = ?', (key,)).fetchone()
+        return default if row is None else self._unpack(*row)
+
+    def __getitem__(self, X):
+        value = self.get(X)
+        if value is None:
+            raise KeyError(X)
+        return value
+
+    def __contains__(self, X):
+        return self.get(X) is not None
+
+    def __setitem__(self, X, value):
+        self.pending[self._key(X)] = self._pack(value)
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def __len__(self):
+        self.flush()
+        return self.db.execute('SELECT COUNT(*) FROM points').fetchone()[0]
+
+    def flush(self):
+        """
+        Write the buffered points in one transaction. A point that another
+        process has stored since it was looked up is left as it is, and
+        (value, stored value) is added to self.conflicts for the caller to
+        check for a collision
+        """
+        if not self.pending:
+            return
+        keys = list(self.pending)
+        stored = {}
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            # SQLite allows at most 999 parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                rows = self.db.execute('SELECT key, record, tag FROM points WHERE key IN (%s)'
+                                       % ','.join('?' * len(chunk)), chunk)
+                stored.update((key, (record, tag)) for key, record, tag in rows)
+            self.db.executemany('INSERT INTO points VALUES (?, ?, ?)',
+                                [(key,) + self.pending[key] for key in keys if key not in stored])
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        for key, row in stored.items():
+            self.conflicts.append((self._unpack(*self.pending[key]), self._unpack(*row)))
+        self.pending.clear()
+
+    def reopen(self):
+        """
+        A new connection to the same file, for use in another process
+        """
+        return DistinguishedPointStore(self.filename, self.p, self.n, self.batch, self.timeout)
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def __getstate__(self):
+        # Pickled, for example in a checkpoint, as the path to the file
+        self.flush()
+        state = self.__dict__.copy()
+        del state['db']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._connect()
+
+
+# %%
+"""
+# Parallel Pollard Rho with distinguished points
+Every process runs its own walks with the same r-adding steps and only
+reports the distinguished points, those whose x ends in dp_bits zero bits.
+Two walks that meet carry on together to the same distinguished point, so
+a repeated distinguished point is a collision
+"""
+# %%
+def is_distinguished(X, dp_bits):
+    """
+    Whether the last dp_bits bits of x are all zero
+    """
+    return X is not INFINITY and X.x & ((1 << dp_bits) - 1) == 0
+
+
+def default_dp_bits(n):
+    """
+    A distinguished point rate giving a few thousand points per sqrt(n)
+    steps, so the table stays small and a collision is noticed quickly
+    """
+    return max(0, n.bit_length() // 4 - 1)
+
+
+def _escape_cycle(E, cycle, n):
+    """
+    Leave a fruitless cycle of the negation walk from its smallest point,
+    so every walk caught in the same cycle leaves it the same way
+    """
+    X, c, d = min(cycle, key=lambda t: (-1, -1) if t[0] is INFINITY else t[0])
+    return canonical(E, E.ECPointDoubling(X), 2 * c, 2 * d, n)
+
+
+def _dp_walks(E, P, Q, n, steps, dp_bits, rng, negation=False, monitor=None):
+    """
+    Run r-adding walks forever, yielding (X, c, d) for every distinguished
+    point. A walk that goes 20 times longer than expected without a
+    distinguished point, or comes back round to one of its own, is stuck
+    in a cycle and is restarted.
+
+    With the negation map the walk also watches for fruitless 2 and 4
+    cycles, which look-ahead makes rare but not impossible, and doubles
+    its way out of them
+    """
+    if negation:
+        f = negation_walk(E, P, Q, n, steps=steps)
+    else:
+        f = adding_walk(E, P, Q, n, steps=steps)
+    if monitor is not None:
+        f = monitored_walk(f, monitor, 'negation' if negation else 'adding')
+    max_length = 20 << dp_bits
+    while True:
+        c = rng.randrange(1, n)
+        d = rng.randrange(1, n)
+        X = E.multi_scalar_mult([(c, P), (d, Q)])
+        if negation:
+            X, c, d = canonical(E, X, c, d, n)
+        # The last four points of the walk, the i-th step goes in recent[i % 4]
+        recent = [(None, 0, 0)] * 4
+        i = length = 0
+        visited = set()
+        while length < max_length:
+            X, c, d = f(X, c, d)
+            length += 1
+            if negation:
+                i += 1
+                if X == recent[(i - 2) % 4][0]:
+                    X, c, d = _escape_cycle(E, [recent[(i - 1) % 4], (X, c, d)], n)
+                elif X == recent[i % 4][0]:
+                    X, c, d = _escape_cycle(E, recent, n)
+                recent[i % 4] = (X, c, d)
+            if is_distinguished(X, dp_bits):
+                if monitor is not None:
+                    monitor.found()
+                yield X, c, d
+                if X in visited:
+                    break
+                visited.add(X)
+                length = 0
+
+
+def _dp_multiwalks(E, P, Q, n, steps, dp_bits, rng, walks, progress=None, monitor=None):
+    """
+    Run `walks` r-adding walks in lockstep, yielding (X, c, d) for every
+    distinguished point. All of the additions of one step share a single
+    modular inversion through ECC.batch_add. Walks are restarted when they
+    are stuck in a cycle, as in _dp_walks.
+
+    The walks are kept in progress['walks'] as [X, c, d, length, visited]
+    and the total steps in progress['steps'], so a caller can save them
+    whenever a point is yielded and carry on from there later
+    """
+    r = len(steps)
+    max_length = 20 << dp_bits
+
+    def start():
+        c = rng.randrange(1, n)
+        d = rng.randrange(1, n)
+        return [E.multi_scalar_mult([(c, P), (d, Q)]), c, d, 0, set()]
+
+    if progress is None:
+        progress = {}
+    progress.setdefault('steps', 0)
+    state = progress.setdefault('walks', [])
+    while len(state) < walks:
+        state.append(start())
+    while True:
+        progress['steps'] += walks
+        if monitor is not None:
+            monitor.count(walks, walks, 0, 1)
+        chosen = [steps[walk_index(s[0], r)] for s in state]
+        Xs = E.batch_add([s[0] for s in state], [R_j for R_j, _, _ in chosen])
+        for i, (X, (_, a_j, b_j)) in enumerate(zip(Xs, chosen)):
+            s = state[i]
+            s[0] = X
+            s[1] = (s[1] + a_j) % n
+            s[2] = (s[2] + b_j) % n
+            s[3] += 1
+            if is_distinguished(X, dp_bits):
+                if monitor is not None:
+                    monitor.found()
+                yield X, s[1], s[2]
+                if X in s[4]:
+                    state[i] = start()
+                    continue
+                s[4].add(X)
+                s[3] = 0
+            elif s[3] >= max_length:
+                state[i] = start()
+
+
+def _rho_worker(E, P, Q, n, steps, dp_bits, seed, queue, negation, walks, table=None):
+    """
+    Put every distinguished point found by _dp_walks or _dp_multiwalks on
+    the queue. Given a DistinguishedPointStore the worker adds the points
+    to it itself and only puts collisions (c, d, c_, d_) on the queue
+    """
+    rng = random.Random(seed)
+    if walks > 1:
+        dps = _dp_multiwalks(E, P, Q, n, steps, dp_bits, rng, walks)
+    else:
+        dps = _dp_walks(E, P, Q, n, steps, dp_bits, rng, negation)
+    if table is None:
+        for dp in dps:
+            queue.put(dp)
+        return
+    table = table.reopen()
+    for X, c, d in dps:
+        earlier = _is_collision(table, X, c, d, n)
+        if earlier:
+            queue.put((c, d) + earlier)
+        while table.conflicts:
+            value, stored = table.conflicts.pop()
+            if (value[1] - stored[1]) % n != 0:
+                queue.put(value[:2] + stored[:2])
+
+
+def _next_report(queue, workers, timeout=1):
+    """
+    The next item the workers put on the queue, waiting `timeout` seconds
+    at a time so that a RuntimeError is raised once every worker has
+    exited rather than blocking forever
+    """
+    while True:
+        # Checked before waiting, as a worker's last items are on the queue
+        # by the time it has exited
+        exited = all(w.exitcode is not None for w in workers)
+        try:
+            return queue.get(timeout=timeout)
+        except Empty:
+            if exited:
+                codes = [w.exitcode for w in workers]
+                raise RuntimeError(f"Every worker has exited, with exit codes {codes}")
+
+
+def _is_collision(table, X, c, d, n):
+    """
+    Record the distinguished point X = cP + dQ, returning the earlier
+    coefficients if X was already reached from a different d
+    """
+    earlier = table.get(X)
+    if earlier is None:
+        table[X] = (c, d)
+    elif (d - earlier[1]) % n != 0:
+        return earlier[:2]
+
+
+def negationPollardRho(E, P, Q, n, dp_bits=None, r=32, seed=None, table=None, monitor=None):
+    """
+    Pollard Rho on the classes {X, -X} using distinguished points, in one
+    process. Expect about sqrt(pi n / 4) steps rather than sqrt(pi n / 2)
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+    dp_bits (int): Zero bits at the end of x for a distinguished point
+    r (int): The number of branches of the walk
+    seed (int): Seed for the walk steps and starting points
+    table (DistinguishedPointStore): Where to keep the distinguished
+        points, a dict by default
+    monitor (RhoMonitor): Counts the steps, made with negation=True
+
+    Returns:
+    int, int, int, int: c, d, c_, d_ s.t cP + dQ = c_P + d_Q
+    """
+    rng = random.Random(seed)
+    if dp_bits is None:
+        dp_bits = default_dp_bits(n)
+    steps = adding_walk_steps(E, P, Q, n, r, rng)
+    if table is None:
+        table = {}
+    for X, c, d in _dp_walks(E, P, Q, n, steps, dp_bits, rng,
+                             negation=True, monitor=monitor):
+        earlier = _is_collision(table, X, c, d, n)
+        if earlier:
+            if monitor is not None:
+                monitor.finish()
+            return (c, d) + earlier
+
+
+def save_checkpoint(filename, job):
+    """
+    Write a rho job to disk, through a temporary file so a crash while
+    writing never leaves a broken checkpoint behind
+    """
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(job, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, filename)
+
+
+def load_checkpoint(filename):
+    """
+    Read a rho job written by save_checkpoint
+    """
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
+
+
+def _run_multiwalk(job, checkpoint, interval, monitor=None):
+    """
+    Run the walks of a multi-walk job until a collision, checkpointing
+    every `interval` seconds. The clock is only read at distinguished
+    points, so checkpointing costs nothing per step
+    """
+    E, P, Q, n = job['E'], job['P'], job['Q'], job['n']
+    table = job['table']
+    if monitor is not None and job['progress'].get('steps'):
+        monitor.resume(job['progress']['steps'])
+    last = time.monotonic()
+    for X, c, d in _dp_multiwalks(E, P, Q, n, job['steps'], job['dp_bits'], job['rng'],
+                                  job['walks'], job['progress'], monitor):
+        earlier = _is_collision(table, X, c, d, n)
+        if earlier:
+            if checkpoint and os.path.exists(checkpoint):
+                os.remove(checkpoint)
+            if monitor is not None:
+                monitor.finish()
+            return (c, d) + earlier
+        if checkpoint and time.monotonic() - last >= interval:
+            save_checkpoint(checkpoint, job)
+            last = time.monotonic()
+
+
+def multiWalkPollardRho(E, P, Q, n, walks=64, dp_bits=None, r=32, seed=None,
+                        checkpoint=None, interval=60, table=None, monitor=None):
+    """
+    Pollard Rho with many walks advanced together in one process, so that
+    each step costs one modular inversion for all of the walks instead of
+    one per walk. Collisions are found between distinguished points.
+
+    With a checkpoint file the walks, step count, random state and table
+    of distinguished points are saved every `interval` seconds, and an
+    interrupted run can be carried on with resumePollardRho. A
+    DistinguishedPointStore is saved as the path to its file
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+    walks (int): The number of walks run side by side
+    dp_bits (int): Zero bits at the end of x for a distinguished point
+    r (int): The number of branches of the r-adding walk
+    seed (int): Seed for the walk steps and starting points
+    checkpoint (str): File to save the run to, removed once it finishes
+    interval (int): Seconds between checkpoints
+    table (DistinguishedPointStore): Where to keep the distinguished
+        points, a dict by default
+    monitor (RhoMonitor): Counts the steps, which share one inversion
+
+    Returns:
+    int, int, int, int: c, d, c_, d_ s.t cP + dQ = c_P + d_Q
+    """
+    rng = random.Random(seed)
+    if dp_bits is None:
+        dp_bits = default_dp_bits(n)
+    job = {
+        'E': E, 'P': P, 'Q': Q, 'n': n,
+        'steps': adding_walk_steps(E, P, Q, n, r, rng),
+        'dp_bits': dp_bits,
+        'walks': walks,
+        'rng': rng,
+        'progress': {},
+        'table': {} if table is None else table,
+    }
+    return _run_multiwalk(job, checkpoint, interval, monitor)
+
+
+def resumePollardRho(checkpoint, interval=60, monitor=None):
+    """
+    Carry on a multiWalkPollardRho run from its checkpoint file
+
+    Parameters:
+    checkpoint (str): The checkpoint file, which keeps being updated
+    interval (int): Seconds between checkpoints
+    monitor (RhoMonitor): Counts the steps, starting from those saved
+
+    Returns:
+    int, int, int, int: c, d, c_, d_ s.t cP + dQ = c_P + d_Q
+    """
+    return _run_multiwalk(load_checkpoint(checkpoint), checkpoint, interval, monitor)
+
+
+def parallelPollardRho(E, P, Q, n, processes=None, dp_bits=None, r=32, seed=None,
+                       negation=False, walks=1, table=None, monitor=None):
+    """
+    van Oorschot-Wiener parallel Pollard Rho, finds a collision using
+    several processes. On platforms that spawn rather than fork processes
+    call it from under `if __name__ == '__main__':`
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+    processes (int): Number of worker processes, defaults to the CPU count
+    dp_bits (int): Zero bits at the end of x for a distinguished point
+    r (int): The number of branches of the r-adding walk
+    seed (int): Seed for the walk steps and the workers
+    negation (bool): Walk on the classes {X, -X}, see negationPollardRho
+    walks (int): Walks run side by side in each process, sharing their
+        inversions as in multiWalkPollardRho, without the negation map
+    table (DistinguishedPointStore): Where to keep the distinguished
+        points. The workers write to it themselves and only report
+        collisions, otherwise they report every point to a dict here
+    monitor (RhoMonitor): Counts the steps, estimated as 2**dp_bits for
+        each distinguished point reported, so not with a table
+
+    Returns:
+    int, int, int, int: c, d, c_, d_ s.t cP + dQ = c_P + d_Q
+    """
+    rng = random.Random(seed)
+    processes = processes or multiprocessing.cpu_count()
+    if dp_bits is None:
+        dp_bits = default_dp_bits(n)
+    steps = adding_walk_steps(E, P, Q, n, r, rng)
+
+    if table is not None:
+        table.flush()
+    queue = multiprocessing.Queue()
+    workers = []
+    for _ in range(processes):
+        args = (E, P, Q, n, steps, dp_bits, rng.getrandbits(64), queue, negation, walks, table)
+        workers.append(multiprocessing.Process(target=_rho_worker, args=args, daemon=True))
+    for w in workers:
+        w.start()
+
+    try:
+        if table is not None:
+            return _next_report(queue, workers)
+        table = {}
+        expected = 1 << dp_bits
+        while True:
+            X, c, d = _next_report(queue, workers)
+            if monitor is not None:
+                monitor.count(expected, expected, 0, -(-expected // walks))
+                monitor.found()
+            earlier = _is_collision(table, X, c, d, n)
+            if earlier:
+                if monitor is not None:
+                    monitor.finish()
+                return (c, d) + earlier
+    finally:
+        for w in workers:
+            w.terminate()
+        for w in workers:
+            w.join()
+# %%
+"""
+# Multi-target Pollard Rho
+"""
+# %%
+def target_tag(Q):
+    """
+    A 62 bit tag for a target point from its compressed encoding, the same
+    in every run so stored points can be traced back to their target
+    """
+    return ((Q.x << 1) | (Q.y & 1)) & ((1 << 62) - 1)
+
+
+def multiTargetPollardRho(E, P, Qs, n, walks=64, dp_bits=None, r=32, seed=None, table=None,
+                          monitor=None):
+    """
+    The discrete logs of several points Q_t = k_t P from one run, after
+    Kuhn and Struik. The walks only add multiples of P, R_j = a_j P, so
+    they are the same function whatever the target and every distinguished
+    point stays useful. A walk starts from cP + dQ_t for a random unsolved
+    target and random c and d, and keeps its d, so its points are stored
+    as (c, d, t) with t = target_tag(Q_t).
+
+    Each log is kept as k_t = alpha + beta k_u for a root target u, or as
+    a known k_t with u = -1, and points are stored in terms of their root.
+    Walks meeting at a distinguished point with the same root and different
+    d solve the root, and so every target tied to it, as does meeting a
+    point of known log. Meeting a point of another root gives a linear
+    relation which ties the two roots together.
+    Walks that reach a stored point are restarted, since from there they
+    follow an old trail, as are walks of a solved target once they store a
+    point, since two points of known log tell us nothing. Over 300 runs on
+    a 26 bit subgroup 1, 2, 4 and 8 targets took 1.18, 1.79, 2.58 and 3.70
+    sqrt(pi n / 2) steps, against 1.16 for each run of multiWalkPollardRho
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Qs (list): The points Q_t = k_t P
+    n (int): The order of P
+    walks (int): The number of walks run side by side
+    dp_bits (int): Zero bits at the end of x for a distinguished point
+    r (int): The number of branches of the r-adding walk
+    seed (int): Seed for the walk steps and starting points
+    table (DistinguishedPointStore): Where to keep the distinguished
+        points, a dict by default. The points of known log in a store
+        kept from an earlier run with the same seed and r stay useful
+    monitor (RhoMonitor): Counts the steps for all of the targets
+
+    Returns:
+    list: k_t s.t. Q_t = k_t P for each target
+    """
+    rng = random.Random(seed)
+    if dp_bits is None:
+        dp_bits = default_dp_bits(n)
+    if table is None:
+        table = {}
+    steps = []
+    for _ in range(r):
+        a_j = rng.randrange(1, n)
+        steps.append((E.ECPointMult(a_j, P), a_j))
+    max_length = 20 << dp_bits
+
+    targets = {target_tag(Q): Q for Q in Qs if Q is not INFINITY}
+    # logs[t] = (u, alpha, beta) for k_t = alpha + beta k_u, with u = -1
+    # and beta = 0 once k_t is known
+    logs = {t: (t, 0, 1) for t in targets}
+    unsolved = set(targets)
+
+    def inverse(x):
+        return pow(x, -1, n) if math.gcd(x, n) == 1 else None
+
+    def resolve(c, d, t):
+        # cP + dQ_t as c_P + d_Q_u for the root u of t, None for a target
+        # of an earlier run
+        if t == -1:
+            return c, 0, -1
+        if t not in logs:
+            return None
+        u, alpha, beta = logs[t]
+        return (c + d * alpha) % n, d * beta % n, u
+
+    def solve(u, k):
+        for t, (root, alpha, beta) in logs.items():
+            if root == u:
+                k_t = (alpha + beta * k) % n
+                if E.ECPointMult(k_t, P) != targets[t]:
+                    raise ValueError("Q is not a multiple of P")
+                logs[t] = (-1, k_t, 0)
+                unsolved.discard(t)
+
+    def tie(u, v, alpha, beta):
+        # k_v = alpha + beta k_u, so every target of root v moves to u
+        for t, (root, a_t, b_t) in logs.items():
+            if root == v:
+                logs[t] = (u, (a_t + b_t * alpha) % n, b_t * beta % n)
+
+    def start():
+        t = rng.choice(sorted(unsolved))
+        c = rng.randrange(n)
+        d = rng.randrange(1, n)
+        return [E.multi_scalar_mult([(c, P), (d, targets[t])]), c, d, t, 0]
+
+    state = [start() for _ in range(walks)] if targets else []
+    while unsolved:
+        if monitor is not None:
+            monitor.count(walks, walks, 0, 1)
+        chosen = [steps[walk_index(s[0], r)] for s in state]
+        Xs = E.batch_add([s[0] for s in state], [R_j for R_j, _ in chosen])
+        for i, (X, (_, a_j)) in enumerate(zip(Xs, chosen)):
+            s = state[i]
+            s[0] = X
+            s[1] = (s[1] + a_j) % n
+            s[4] += 1
+            if is_distinguished(X, dp_bits):
+                if monitor is not None:
+                    monitor.found()
+                c, d, u = resolve(s[1], s[2], s[3])
+                stored = table.get(X)
+                if stored is None:
+                    table[X] = (c, d, u)
+                    if u != -1:
+                        s[4] = 0
+                    else:
+                        # The walk's target is solved, so its points would
+                        # only meet other points of known log
+                        state[i] = start()
+                    continue
+                earlier = resolve(*stored)
+                # cP + dQ_u = c_P + d_Q_u_, where Q_-1 = O
+                if earlier is not None:
+                    c_, d_, u_ = earlier
+                    if u == u_:
+                        inv = inverse(d - d_)
+                        if u != -1 and inv is not None:
+                            solve(u, (c_ - c) * inv % n)
+                    elif u == -1:
+                        inv = inverse(d_)
+                        if inv is not None:
+                            solve(u_, (c - c_) * inv % n)
+                    elif u_ == -1:
+                        inv = inverse(d)
+                        if inv is not None:
+                            solve(u, (c_ - c) * inv % n)
+                    else:
+                        inv = inverse(d_)
+                        if inv is not None:
+                            tie(u, u_, (c - c_) * inv % n, d * inv % n)
+                if not unsolved:
+                    break
+                state[i] = start()
+            elif s[4] >= max_length:
+                state[i] = start()
+    if monitor is not None:
+        monitor.finish()
+    return [0 if Q is INFINITY else logs[target_tag(Q)][1] for Q in Qs]
+# %%
+"""
+# Baby-step giant-step
+"""
+# %%
+def babyStepGiantStep(E, P, Q, n, max_table=None, block=256):
+    """
+    Deterministic baby-step giant-step. The baby steps jP for
+    0 <= j <= m/2, m = ceil(sqrt(n)), are stored in a dict keyed by x
+    alone, since jP and -jP share it, so each match gives k = im + j or
+    im - j for a giant step Q - imP.
+
+    If the table would have more than max_table entries the baby steps
+    are split into chunks of that size and the giant steps are repeated
+    for each chunk, trading time for memory
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+    max_table (int): The most baby steps to hold at once
+    block (int): Giant steps converted to affine with one inversion
+
+    Returns:
+    int: k s.t. Q = kP
+    """
+    if Q is INFINITY:
+        return 0
+    m = math.isqrt(n - 1) + 1
+    baby = m // 2 + 1
+    chunk = min(baby, max_table or baby)
+    giants = -(-n // m) + 1
+    minus_mP = E.to_jacobian(E.ECPointNegation(E.ECPointMult(m, P)))
+
+    for lo in range(0, baby, chunk):
+        # Baby steps in Jacobian coordinates, then one shared inversion
+        Js = [E.to_jacobian(E.ECPointMult(lo, P))]
+        for _ in range(min(chunk, baby - lo) - 1):
+            Js.append(E.jacobian_mixed_add(Js[-1], P))
+        table = {}
+        for j, X in enumerate(E.batch_from_jacobian(Js), lo):
+            if X is not INFINITY:
+                table.setdefault(X.x, j)
+            elif j == 0:
+                table[None] = 0
+
+        G = E.to_jacobian(Q)
+        for i0 in range(0, giants, block):
+            Gs = []
+            for _ in range(min(block, giants - i0)):
+                Gs.append(G)
+                G = E.jacobian_add(G, minus_mP)
+            for i, X in enumerate(E.batch_from_jacobian(Gs), i0):
+                j = table.get(X.x)
+                if j is None and X.x is not None:
+                    continue
+                for k in (i * m + j, i * m - j):
+                    if E.ECPointMult(k % n, P) == Q:
+                        return k % n
+    raise ValueError("Q is not a multiple of P")
+# %%
+"""
+# Pollard Kangaroo
+For k known to lie in [a, b]. Tame kangaroos start from known multiples of
+P in the middle of the interval, wild ones from Q, and all of them jump
+forward by multiples of P picked from x. A wild kangaroo that lands on a
+tame one's track follows it to the same distinguished point, and the
+difference in the distances they travelled gives k.
+
+With T tame and W = T + 1 wild kangaroos spaced T and W apart, and every
+jump a multiple of TW, two kangaroos of the same kind never meet (Pollard,
+Kangaroos, Monopoly and Discrete Logarithms), so the herds can be run in
+separate processes without ever restarting a kangaroo
+"""
+# %%
+TAME = 0
+WILD = 1
+
+
+def _kangaroo_setup(E, P, Q, a, b, tame, dp_bits):
+    """
+    The jump table, starting points, distinguished point rate and step
+    limit for `tame` tame and tame + 1 wild kangaroos on [a, b]
+
+    Returns:
+    list, list, int, int: [(s, sP)], [(kind, X, distance)], dp_bits, steps
+    """
+    w = b - a
+    wild = tame + 1
+    spacing = tame * wild
+    # Jumps of spacing * 2^j for j < r, with mean near the (T + W) sqrt(w) / 4
+    # that balances catching up against landing on a track
+    target = (tame + wild) * math.isqrt(w) / 4
+    r = 1
+    while spacing * ((1 << r) - 1) / r < target:
+        r += 1
+    jumps = [(spacing << j, E.ECPointMult(spacing << j, P)) for j in range(r)]
+    mean = spacing * ((1 << r) - 1) // r
+
+    start = a + w // 2
+    starts = [(TAME, E.ECPointMult(start + i * wild, P), start + i * wild)
+              for i in range(tame)]
+    starts += [(WILD, E.ECPointAddition(Q, E.ECPointMult(j * tame, P)), j * tame)
+               for j in range(wild)]
+
+    # Steps to cover the gap between the herds, then to land on a track
+    expected = w // (2 * mean) + mean // spacing + 1
+    if dp_bits is None:
+        dp_bits = max(0, expected.bit_length() - 5)
+    return jumps, starts, dp_bits, 16 * expected + (32 << dp_bits)
+
+
+def _kangaroo_herd(E, jumps, starts, dp_bits, max_steps):
+    """
+    Run the kangaroos in lockstep for max_steps jumps, yielding
+    (X, kind, distance) at every distinguished point. The additions of
+    each jump share a single modular inversion through ECC.batch_add
+    """
+    r = len(jumps)
+    kinds = [kind for kind, _, _ in starts]
+    Xs = [X for _, X, _ in starts]
+    distances = [distance for _, _, distance in starts]
+    for _ in range(max_steps):
+        chosen = [jumps[walk_index(X, r)] for X in Xs]
+        Xs = E.batch_add(Xs, [sP for _, sP in chosen])
+        for i, (s, _) in enumerate(chosen):
+            distances[i] += s
+            X = Xs[i]
+            if is_distinguished(X, dp_bits):
+                yield X, kinds[i], distances[i]
+
+
+def _kangaroo_worker(E, P, Q, a, b, n, jumps, starts, dp_bits, max_steps, queue, table=None):
+    """
+    Put every distinguished point of a herd on the queue, then None once
+    the herd has used up its steps. Given a DistinguishedPointStore the
+    worker adds the points to it itself and only puts k on the queue
+    """
+    dps = _kangaroo_herd(E, jumps, starts, dp_bits, max_steps)
+    if table is None:
+        for dp in dps:
+            queue.put(dp)
+        queue.put(None)
+        return
+    table = table.reopen()
+    for dp in dps:
+        k = _kangaroo_collision(E, P, Q, a, b, n, table, *dp)
+        if k is not None:
+            queue.put(k)
+        while table.conflicts:
+            k = _kangaroo_log(E, P, Q, a, b, n, *table.conflicts.pop())
+            if k is not None:
+                queue.put(k)
+    table.flush()
+    for value, stored in table.conflicts:
+        k = _kangaroo_log(E, P, Q, a, b, n, value, stored)
+        if k is not None:
+            queue.put(k)
+    queue.put(None)
+
+
+def _kangaroo_log(E, P, Q, a, b, n, value, stored):
+    """
+    k in [a, b] from the (kind, distance) of two kangaroos that reached the
+    same point, or None if they are of the same kind. The difference of
+    the distances is only k mod the order n of P, as the kangaroos may
+    have gone round the group or been stored mod n, so outside [a, b] it
+    is reduced mod n, found with E.point_order if it was not given
+    """
+    (kind, distance), (other, other_distance) = value[:2], stored[:2]
+    if kind == other:
+        return None
+    if kind == TAME:
+        k = distance - other_distance
+    else:
+        k = other_distance - distance
+    if not a <= k <= b:
+        k = a + (k - a) % (n or E.point_order(P))
+        if k > b:
+            return None
+    if E.ECPointMult(k, P) == Q:
+        return k
+
+
+def _kangaroo_collision(E, P, Q, a, b, n, table, X, kind, distance):
+    """
+    Record the distinguished point X, returning k if a kangaroo of the
+    other kind has already been there
+    """
+    if isinstance(table, DistinguishedPointStore):
+        distance %= table.n
+    stored = table.get(X)
+    if stored is None:
+        table[X] = (kind, distance)
+        return None
+    return _kangaroo_log(E, P, Q, a, b, n, (kind, distance), stored)
+
+
+def _kangaroo_table(table, a, b, n):
+    """
+    A dict for the distinguished points, or the given store if its
+    records can hold the distances mod a number above b - a, and the
+    order of P, the store's n if it was not given. Intervals that are not
+    well below the order are refused, since kangaroos that go round the
+    group can land on each other's tracks and never meet
+    """
+    if table is not None:
+        if table.n <= b - a:
+            raise ValueError("The store's n must be greater than b - a")
+        n = n or table.n
+    if n is not None and b - a > n // 4:
+        raise ValueError("b - a must be below n / 4, use Pollard Rho for wider intervals")
+    return ({} if table is None else table), n
+
+
+def pollardKangaroo(E, P, Q, a, b, herd=1, dp_bits=None, table=None, n=None):
+    """
+    Pollard's kangaroo (lambda) method, finds k in [a, b] with Q = kP in
+    about 2 sqrt(b - a) group operations. The run is deterministic
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    a (int): The lower end of the interval holding k
+    b (int): The upper end of the interval holding k
+    herd (int): Tame kangaroos, with herd + 1 wild ones, run side by side
+        sharing their inversions
+    dp_bits (int): Zero bits at the end of x for a distinguished point
+    table (DistinguishedPointStore): Where to keep the distinguished
+        points, a dict by default. Its n must be greater than b - a
+    n (int): The order of P, if known. b - a must then be below n / 4
+
+    Returns:
+    int: k s.t. Q = kP, a <= k <= b
+    """
+    table, n = _kangaroo_table(table, a, b, n)
+    jumps, starts, dp_bits, max_steps = _kangaroo_setup(E, P, Q, a, b, herd, dp_bits)
+    for X, kind, distance in _kangaroo_herd(E, jumps, starts, dp_bits, max_steps):
+        k = _kangaroo_collision(E, P, Q, a, b, n, table, X, kind, distance)
+        if k is not None:
+            return k
+    raise ValueError("No collision, Q is probably not kP for k in [a, b]")
+
+
+def parallelKangaroo(E, P, Q, a, b, processes=None, herd=1, dp_bits=None, table=None,
+                     n=None):
+    """
+    van Oorschot-Wiener parallel kangaroos. The tame and wild herds are
+    shared out between the processes, which report their distinguished
+    points to this one. On platforms that spawn rather than fork processes
+    call it from under `if __name__ == '__main__':`
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    a (int): The lower end of the interval holding k
+    b (int): The upper end of the interval holding k
+    processes (int): Number of worker processes, defaults to the CPU count
+    herd (int): Tame kangaroos per process, run side by side
+    dp_bits (int): Zero bits at the end of x for a distinguished point
+    table (DistinguishedPointStore): Where to keep the distinguished
+        points. The workers write to it themselves and only report k,
+        otherwise they report every point to a dict here. Its n must be
+        greater than b - a
+    n (int): The order of P, if known. b - a must then be below n / 4
+
+    Returns:
+    int: k s.t. Q = kP, a <= k <= b
+    """
+    processes = processes or multiprocessing.cpu_count()
+    store = table
+    table, n = _kangaroo_table(table, a, b, n)
+    jumps, starts, dp_bits, max_steps = _kangaroo_setup(
+        E, P, Q, a, b, processes * herd, dp_bits)
+
+    if store is not None:
+        store.flush()
+    queue = multiprocessing.Queue()
+    workers = []
+    for i in range(processes):
+        args = (E, P, Q, a, b, n, jumps, starts[i::processes], dp_bits, max_steps, queue, store)
+        workers.append(multiprocessing.Process(target=_kangaroo_worker, args=args, daemon=True))
+    for w in workers:
+        w.start()
+
+    running = processes
+    try:
+        while running:
+            dp = _next_report(queue, workers)
+            if dp is None:
+                running -= 1
+                continue
+            if store is not None:
+                return dp
+            k = _kangaroo_collision(E, P, Q, a, b, n, table, *dp)
+            if k is not None:
+                return k
+    finally:
+        for w in workers:
+            w.terminate()
+        for w in workers:
+            w.join()
+    raise ValueError("No collision, Q is probably not kP for k in [a, b]")
+# %%
+"""
+# Pohlig-Hellman
+When n is composite the discrete log can be found mod each prime power
+q**e dividing n, in the subgroup of order q, and put together with the CRT
+"""
+# %%
+def primeOrderLog(E, P, Q, q, small=2**32, seed=None):
+    """
+    Discrete log in a subgroup of prime order q, by baby-step giant-step
+    for q below `small` and by multi-walk Pollard Rho otherwise
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): A point of prime order q
+    Q (Point): A multiple of P
+    q (int): The order of P
+    small (int): Below this q baby-step giant-step is used
+    seed (int): Seed for Pollard Rho
+
+    Returns:
+    int: k s.t. Q = kP, 0 <= k < q
+    """
+    if Q is INFINITY:
+        return 0
+    if q < small:
+        return babyStepGiantStep(E, P, Q, q)
+    c, d, c_, d_ = multiWalkPollardRho(E, P, Q, q, walks=min(64, q.bit_length() * 4), seed=seed)
+    return (c - c_) * pow(d_ - d, -1, q) % q
+
+
+def pohligHellman(E, P, Q, n, small=2**32, seed=None):
+    """
+    Find the discrete log Q = kP using the factorisation of the order n of
+    P, so the work is about sqrt of the largest prime factor of n rather
+    than sqrt(n)
+
+    Parameters:
+    E (ECC): The curve to work on
+    P (Point): The base point
+    Q (Point): The point s.t. Q = kP
+    n (int): The order of P
+    small (int): Prime factors below this use baby-step giant-step,
+        larger ones use Pollard Rho
+    seed (int): Seed for Pollard Rho
+
+    Returns:
+    int: k s.t. Q = kP
+    """
+    residues = []
+    moduli = []
+    for q, e in factorise(n).items():
+        # P0 has order q, and the log mod q**e is found one base q digit at a time
+        P0 = E.ECPointMult(n // q, P)
+        k_q = 0
+        for i in range(e):
+            m = n // q**(i + 1)
+            Qi = E.multi_scalar_mult([(m, Q), (-m * k_q, P)])
+            k_q += primeOrderLog(E, P0, Qi, q, small, seed) * q**i
+        residues.append(k_q)
+        moduli.append(q**e)
+
+    k = crt(residues, moduli)
+    if E.ECPointMult(k, P) != Q:
+        raise ValueError("Q is not a multiple of P")
+    return k
@@ -3,58 +3,606 @@
 # ECC Functions and Classes
 """
 # %%
-def EEA(a,b):
-    rs = [a, b]
-    qs = [0, 0]
-    ss = [1, 0]
-    ts = [0, 1]
+import math
+import random
+import sys
+from collections import namedtuple
 
-    i = 1 
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+# %%
+def EEA(a,b):
+    # Only the last two remainders and coefficients are ever needed
+    r0, r1 = a, b
+    t0, t1 = 0, 1
 
-    while rs[i] > 0:
-        i = i + 1
-        qs.append( rs[i-2] // rs[i-1] )
-        rs.append( rs[i-2] - qs[i] * rs[i-1] )
-        ss.append( ss[i-2] - qs[i] * ss[i-1] )
-        ts.append( ts[i-2] - qs[i] * ts[i-1] )
+    while r1 > 0:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        t0, t1 = t1, t0 - q * t1
 
     #      gcd      x       y
     # s.t. ax + by = gcd
-    return ts[i-1]
+    return t0
 
 
 def inverseModp(x, p):
     y = x % p
     t = EEA(p, y)
     return t % p
-# %% 
+
+
+def inverse_pow(x, p):
+    """
+    Modular inverse using Python's built-in pow, which runs the extended
+    Euclidean algorithm in C
+    """
+    return pow(x, -1, p)
+
+
+def inverse_binary(x, p):
+    """
+    Modular inverse using the binary extended Euclidean algorithm, which
+    only shifts and subtracts. p must be odd
+    """
+    u, v = x % p, p
+    x1, x2 = 1, 0
+    if u == 0:
+        raise ValueError(f"{x} has no inverse mod {p}")
+    while u != 1 and v != 1:
+        while u & 1 == 0:
+            u >>= 1
+            x1 = x1 >> 1 if x1 & 1 == 0 else (x1 + p) >> 1
+        while v & 1 == 0:
+            v >>= 1
+            x2 = x2 >> 1 if x2 & 1 == 0 else (x2 + p) >> 1
+        if u >= v:
+            u -= v
+            x1 -= x2
+        else:
+            v -= u
+            x2 -= x1
+        if u == 0 or v == 0:
+            raise ValueError(f"{x} has no inverse mod {p}")
+    return (x1 if u == 1 else x2) % p
+
+
+def inverse_lehmer(x, p):
+    """
+    Modular inverse using Lehmer's extended GCD, which finds several
+    quotients at a time from the leading 63 bits of the operands so that
+    most steps work on small numbers
+    """
+    a, b = p, x % p
+    ua, ub = 0, 1
+    while b >> 64:
+        h = a.bit_length() - 63
+        a_hat = a >> h
+        b_hat = b >> h
+        A, B, C, D = 1, 0, 0, 1
+        while b_hat + C != 0 and b_hat + D != 0:
+            q = (a_hat + A) // (b_hat + C)
+            if q != (a_hat + B) // (b_hat + D):
+                break
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            a_hat, b_hat = b_hat, a_hat - q * b_hat
+        if B == 0:
+            q = a // b
+            a, b = b, a - q * b
+            ua, ub = ub, ua - q * ub
+        else:
+            a, b = A * a + B * b, C * a + D * b
+            ua, ub = A * ua + B * ub, C * ua + D * ub
+    while b:
+        q = a // b
+        a, b = b, a - q * b
+        ua, ub = ub, ua - q * ub
+    if a != 1:
+        raise ValueError(f"{x} has no inverse mod {p}")
+    return ua % p
+
+
+def inverse_gmpy2(x, p):
+    """
+    Modular inverse using gmpy2 (GMP), only available if it is installed
+    """
+    return int(gmpy2.invert(x, p))
+
+
+INVERSE_BACKENDS = {
+    'eea': inverseModp,
+    'pow': inverse_pow,
+    'binary': inverse_binary,
+    'lehmer': inverse_lehmer,
+}
+if gmpy2 is not None:
+    INVERSE_BACKENDS['gmpy2'] = inverse_gmpy2
+
+
+def batch_inverse(values, p, inverse=inverseModp):
+    """
+    Invert many values mod p with a single inversion (Montgomery's trick),
+    at the cost of about 3 extra multiplications per value
+
+    Parameters:
+    values (list): Integers, none of them divisible by p
+    p (int): The modulo prime
+    inverse (function): The modular inverse used for the one inversion
+
+    Returns:
+    list: The inverses, in the same order
+    """
+    prefix = []
+    acc = 1
+    for v in values:
+        if v % p == 0:
+            raise ValueError(f"{v} has no inverse mod {p}")
+        acc = (acc * v) % p
+        prefix.append(acc)
+    if not values:
+        return []
+
+    inv = inverse(acc, p)
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        inverses[i] = (inv * prefix[i-1]) % p
+        inv = (inv * values[i]) % p
+    inverses[0] = inv
+    return inverses
+
+
+def wNAF(k, w):
+    """
+    Width-w non-adjacent form of k, every non-zero digit is odd, below
+    2**(w-1) in absolute value and followed by at least w-1 zeros
+
+    Parameters:
+    k (int): Non-negative scalar
+    w (int): Window width, at least 2
+
+    Returns:
+    list: The digits of k, least significant first
+    """
+    if w < 2:
+        raise ValueError(f"wNAF window must be at least 2, not {w}")
+    digits = []
+    full = 1 << w
+    half = 1 << (w - 1)
+    while k > 0:
+        if k & 1:
+            d = k & (full - 1)
+            if d >= half:
+                d -= full
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def JSF(k0, k1):
+    """
+    Joint sparse form of a pair of scalars, digits in {-1, 0, 1} with on
+    average only half of the columns non-zero
+
+    Parameters:
+    k0 (int): Non-negative scalar
+    k1 (int): Non-negative scalar
+
+    Returns:
+    list: The digit pairs (u0, u1), least significant first
+    """
+    digits = []
+    d0 = d1 = 0
+    while k0 + d0 > 0 or k1 + d1 > 0:
+        l0 = d0 + k0
+        l1 = d1 + k1
+        if l0 % 2 == 0:
+            u0 = 0
+        else:
+            u0 = 2 - (l0 % 4)
+            if l0 % 8 in (3, 5) and l1 % 4 == 2:
+                u0 = -u0
+        if l1 % 2 == 0:
+            u1 = 0
+        else:
+            u1 = 2 - (l1 % 4)
+            if l1 % 8 in (3, 5) and l0 % 4 == 2:
+                u1 = -u1
+        if 2 * d0 == 1 + u0:
+            d0 = 1 - d0
+        if 2 * d1 == 1 + u1:
+            d1 = 1 - d1
+        digits.append((u0, u1))
+        k0 >>= 1
+        k1 >>= 1
+    return digits
+# %%
 """
-# Point and Elliptic Curve Classes
+# Number theory functions
 """
 # %%
-class Point():
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-    def __eq__(self, other):
-        if self.x == other.x and self.y == other.y:
-            return True
+# Miller-Rabin with these bases is exact below 3.3 * 10**24
+MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def is_probable_prime(n, rounds=16):
+    """
+    Miller-Rabin primality test, exact for n < 3.3e24 and otherwise wrong
+    with probability below 4**-rounds
+
+    Parameters:
+    n (int): The number to test
+    rounds (int): Extra random bases for n beyond the exact range
+
+    Returns:
+    bool: Whether n is (probably) prime
+    """
+    if n < 2:
+        return False
+    for q in MR_BASES:
+        if n % q == 0:
+            return n == q
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    bases = list(MR_BASES)
+    if n >= 3317044064679887385961981:
+        bases += [random.randrange(2, n - 1) for _ in range(rounds)]
+    for a in bases:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = (x * x) % n
+            if x == n - 1:
+                break
         else:
             return False
-        
-    def __neq__(self, other):
-        return not self.__eq__(other)
+    return True
+
+
+def pollard_brent(n):
+    """
+    Find a non-trivial factor of the composite n with Brent's variant of
+    Pollard's rho factorisation
+    """
+    if n % 2 == 0:
+        return 2
+    while True:
+        y = random.randrange(1, n)
+        c = random.randrange(1, n)
+        m = 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = (q * abs(x - y)) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def factorise(n):
+    """
+    Factorise n by trial division by small numbers, then Pollard rho
+
+    Parameters:
+    n (int): A positive integer
+
+    Returns:
+    dict: {prime: exponent}
+    """
+    factors = {}
+    for q in range(2, 1000):
+        while n % q == 0:
+            factors[q] = factors.get(q, 0) + 1
+            n //= q
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if is_probable_prime(m):
+            factors[m] = factors.get(m, 0) + 1
+        else:
+            g = pollard_brent(m)
+            stack += [g, m // g]
+    return dict(sorted(factors.items()))
+
+
+def crt(residues, moduli):
+    """
+    Chinese remainder theorem for pairwise coprime moduli
+
+    Parameters:
+    residues (list): x mod each modulus
+    moduli (list): The pairwise coprime moduli
+
+    Returns:
+    int: x mod the product of the moduli
+    """
+    x = 0
+    M = 1
+    for m in moduli:
+        M *= m
+    for r, m in zip(residues, moduli):
+        Mi = M // m
+        x += r * Mi * pow(Mi, -1, m)
+    return x % M
+
+
+def sqrtModp(x, p):
+    """
+    A square root of x mod the odd prime p, by Tonelli-Shanks
+
+    Parameters:
+    x (int): A square mod p
+    p (int): The modulo prime
+
+    Returns:
+    int: y s.t. y**2 = x mod p
+    """
+    x %= p
+    if x == 0:
+        return 0
+    if pow(x, (p - 1) // 2, p) != 1:
+        raise ValueError(f"{x} is not a square mod {p}")
+    if p % 4 == 3:
+        return pow(x, (p + 1) // 4, p)
+    # p - 1 = q * 2**s with q odd, and z any non-square
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q //= 2
+        s += 1
+    z = 2
+    while pow(z, (p - 1) // 2, p) != p - 1:
+        z += 1
+    m, c, t, y = s, pow(z, q, p), pow(x, q, p), pow(x, (q + 1) // 2, p)
+    while t != 1:
+        i, t2 = 0, t
+        while t2 != 1:
+            t2 = (t2 * t2) % p
+            i += 1
+        b = pow(c, 1 << (m - i - 1), p)
+        m, c, t, y = i, (b * b) % p, (t * b * b) % p, (y * b) % p
+    return y
+# %%
+"""
+# Polynomials over GF(p)
+Polynomials are lists of coefficients in [0, p), lowest degree first, with
+no trailing zeros, so [] is 0 and equal polynomials are equal lists
+"""
+# %%
+def poly_trim(A):
+    """
+    Remove the zero leading coefficients of A, in place
+    """
+    while A and A[-1] == 0:
+        A.pop()
+    return A
+
+
+def poly_add(A, B, p):
+    """
+    A + B mod p
+    """
+    if len(A) < len(B):
+        A, B = B, A
+    return poly_trim([(a + b) % p for a, b in zip(A, B)] + A[len(B):])
+
+
+def poly_sub(A, B, p):
+    """
+    A - B mod p
+    """
+    n = max(len(A), len(B))
+    A = A + [0] * (n - len(A))
+    B = B + [0] * (n - len(B))
+    return poly_trim([(a - b) % p for a, b in zip(A, B)])
+
+
+def poly_mul(A, B, p):
+    """
+    A * B mod p by Kronecker substitution: the coefficients are packed into
+    one integer each, wide enough that the coefficients of the product
+    cannot overlap, so a single big integer multiplication does all the work
+
+    Parameters:
+    A (list): Polynomial
+    B (list): Polynomial
+    p (int): The modulo prime
+
+    Returns:
+    list: A * B
+    """
+    if not A or not B:
+        return []
+    width = (2 * p.bit_length() + min(len(A), len(B)).bit_length() + 7) // 8
+    a = int.from_bytes(b''.join(c.to_bytes(width, 'little') for c in A), 'little')
+    b = a if B is A else int.from_bytes(b''.join(c.to_bytes(width, 'little') for c in B), 'little')
+    c = (a * b).to_bytes(width * (len(A) + len(B) - 1), 'little')
+    return poly_trim([int.from_bytes(c[i:i + width], 'little') % p
+                      for i in range(0, len(c), width)])
+
+
+def poly_divmod(A, M, p):
+    """
+    Quotient and remainder of A by M != 0, by long division
+
+    Returns:
+    list, list: Q, R s.t. A = QM + R with deg R < deg M
+    """
+    d = len(M) - 1
+    if len(A) <= d:
+        return [], A
+    A = A[:]
+    inv = pow(M[-1], -1, p)
+    Q = [0] * (len(A) - d)
+    for i in range(len(A) - 1 - d, -1, -1):
+        c = A[i + d] * inv % p
+        if c:
+            Q[i] = c
+            for j in range(d):
+                A[i + j] = (A[i + j] - c * M[j]) % p
+    return poly_trim(Q), poly_trim(A[:d])
+
+
+def poly_xgcd(A, M, p):
+    """
+    The monic gcd g of A and M, with s s.t. sA = g mod M
+
+    Returns:
+    list, list: g, s
+    """
+    r0, r1 = M, A
+    s0, s1 = [], [1]
+    while r1:
+        q, r = poly_divmod(r0, r1, p)
+        r0, r1 = r1, r
+        s0, s1 = s1, poly_sub(s0, poly_mul(q, s1, p), p)
+    inv = pow(r0[-1], -1, p)
+    return [c * inv % p for c in r0], poly_divmod([c * inv % p for c in s0], M, p)[1]
+
+
+class ZeroDivisor(ArithmeticError):
+    def __init__(self, factor):
+        """
+        Raised for an inverse of a non-unit mod a composite polynomial,
+        carrying a proper factor of the modulus
+        """
+        super().__init__("not invertible")
+        self.factor = factor
+
+
+class PolynomialRing():
+    def __init__(self, p, modulus):
+        """
+        GF(p)[x] / (modulus), reducing by Barrett's method: with the power
+        series inverse of the reversed modulus the quotient is found by two
+        multiplications rather than long division
+
+        Parameters:
+        p (int): The modulo prime
+        modulus (list): Polynomial of degree at least 1
+
+        Returns:
+        PolynomialRing: The ring
+        """
+        self.p = p
+        inv = pow(modulus[-1], -1, p)
+        self.modulus = [c * inv % p for c in modulus]
+        self.degree = d = len(modulus) - 1
+        # g = 1 / reversed(modulus) mod x**d by Newton iteration
+        rev = self.modulus[::-1]
+        g, precision = [1], 1
+        while precision < d:
+            precision = min(2 * precision, d)
+            e = [(-c) % p for c in poly_mul(poly_trim(rev[:precision]), g, p)[:precision]]
+            e = e + [0] * (1 - len(e))
+            e[0] = (e[0] + 2) % p
+            g = poly_trim(poly_mul(g, poly_trim(e), p)[:precision])
+        self._inverse = g
+
+    def reduce(self, A):
+        """
+        A mod the modulus
+        """
+        d = self.degree
+        if len(A) <= d:
+            return A
+        if len(A) > 2 * d:
+            return poly_divmod(A, self.modulus, self.p)[1]
+        p = self.p
+        # The reversed quotient is the reversed A times the inverse
+        n = len(A) - d
+        q = poly_mul(poly_trim(A[::-1][:n]), self._inverse, p)[:n]
+        Q = poly_trim((q + [0] * (n - len(q)))[::-1])
+        return poly_sub(A[:d], poly_mul(Q, self.modulus, p)[:d], p)
+
+    def mul(self, A, B):
+        return self.reduce(poly_mul(A, B, self.p))
+
+    def pow(self, A, e):
+        """
+        A**e mod the modulus, by square and multiply
+        """
+        R = [1]
+        A = self.reduce(A)
+        for bit in bin(e)[2:]:
+            R = self.mul(R, R)
+            if bit == '1':
+                R = self.mul(R, A)
+        return R
+
+    def inverse(self, A):
+        """
+        The inverse of A mod the modulus, raising ZeroDivisor with the
+        smaller of gcd(A, modulus) and its cofactor if there is none
+        """
+        A = self.reduce(A)
+        if not A:
+            raise ZeroDivisionError("inverse of 0")
+        g, s = poly_xgcd(A, self.modulus, self.p)
+        if len(g) > 1:
+            cofactor = poly_divmod(self.modulus, g, self.p)[0]
+            raise ZeroDivisor(min(g, cofactor, key=len))
+        return s
+# %% 
+"""
+# Point and Elliptic Curve Classes
+"""
+# %%
+class Point(namedtuple('Point', ['x', 'y'])):
+    """
+    An affine point (x, y), stored as an immutable tuple so that points
+    are small, hashable and compare quickly. The point at infinity is the
+    single object INFINITY, check for it with `P is INFINITY`
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        # Keep INFINITY a singleton when pickled, e.g. between processes
+        if self is INFINITY:
+            return 'INFINITY'
+        return (Point, tuple(self))
 
     def __str__(self):
+        if self is INFINITY:
+            return "O"
         return f"({self.x}, {self.y})"
 
     def __repr__(self):
         return str(self)
 
 
+INFINITY = Point(None, None)
+
+# From here up ECC.order() uses Schoof's algorithm rather than Mestre's, the
+# two take about as long near 76 bits (around 30s each in pure Python)
+SCHOOF_MIN_P = 2**76
+
+
 class ECC():
-    def __init__(self, p, a, b):
+    def __init__(self, p, a, b, coords='affine', mult='binary', window=4,
+                 inverse='pow'):
         """
         Create an Elliptic Curve with y**3 = x**3 + ax + b
 
@@ -62,6 +610,13 @@ class ECC():
         p (int): The modulo prime
         a (int): a
         b (int): b
+        coords (str): The coordinate system used inside ECPointMult,
+            'affine' or 'jacobian' (no modular inversions until the end)
+        mult (str): The default scalar multiplication method, 'binary'
+            or 'wnaf'
+        window (int): The default window width for 'wnaf'
+        inverse (str): The modular inverse backend, one of the keys of
+            INVERSE_BACKENDS
 
         Returns:
         int: The value to return
@@ -70,6 +625,19 @@ class ECC():
         self.a = a
         self.b = b
         assert 4*a**3 + 27*b**2 != 0
+        if coords not in ('affine', 'jacobian'):
+            raise ValueError(f"Unknown coordinate system '{coords}'")
+        self.coords = coords
+        if mult not in ('binary', 'wnaf'):
+            raise ValueError(f"Unknown scalar multiplication method '{mult}'")
+        self.mult = mult
+        if window < 2:
+            raise ValueError(f"wNAF window must be at least 2, not {window}")
+        self.window = window
+        if inverse not in INVERSE_BACKENDS:
+            raise ValueError(f"Unknown inverse backend '{inverse}'")
+        self.inverse = INVERSE_BACKENDS[inverse]
+        self._order = None
 
     def ECPointAddition(self, P, Q):
         """
@@ -83,25 +651,22 @@ class ECC():
         Point: The value of P + Q
         """
         # If P is infinity, return Q
-        if (P.x, P.y) == (self.p, self.p):
+        if P is INFINITY:
             return Q
         # If Q is infinity, return P
-        if (Q.x, Q.y) == (self.p, self.p):
+        if Q is INFINITY:
             return P
         # If P = -Q, return infinity
         if P.x == Q.x and P.y == (-Q.y) % self.p:
-            return Point(self.p, self.p)
-        # If P = -Q, return infinity
-        if (P.x, P.y) == (Q.x, Q.y) and P.y == 0:
-            return Point(self.p, self.p)
+            return INFINITY
         # 2P, for P != -P # POINT DOUBLING
-        if (P.x, P.y) == (Q.x, Q.y) and P.y != 0:
-            z = (3 * P.x**2 + self.a) * inverseModp(2*P.y, self.p)
+        if P == Q:
+            z = (3 * P.x**2 + self.a) * self.inverse(2*P.y, self.p)
             x3 = (z**2 - 2*P.x) % self.p
             y3 = (z*(P.x - x3) - P.y) % self.p
             return Point(x3, y3)
         else:
-            z = ( (Q.y - P.y) * inverseModp( Q.x-P.x, self.p ) ) % self.p
+            z = ( (Q.y - P.y) * self.inverse( Q.x-P.x, self.p ) ) % self.p
             x3 = ( z**2 - P.x - Q.x ) % self.p
             y3 = ( z * (P.x - x3) - P.y ) % self.p
             return Point(x3, y3)
@@ -116,27 +681,300 @@ class ECC():
         Returns:
         Point: The value of 2P
         """
-        if P.y == -P.y:
-            return Point(self.p, self.p)
+        if P is INFINITY or P.y % self.p == 0:
+            return INFINITY
         else:
-            z = ( (3*(P.x**2)%self.p + self.a) * inverseModp( 2*P.y, self.p ) ) % self.p
+            z = ( (3*(P.x**2)%self.p + self.a) * self.inverse( 2*P.y, self.p ) ) % self.p
             x3 = ( (z**2) - 2*P.x ) % self.p
             y3 = ( z * (P.x - x3) - P.y ) % self.p
             return Point(x3, y3)
 
 
-    def ECPointMult(self, k, P):
+    def batch_add(self, Ps, Qs):
+        """
+        Compute P + Q for many independent pairs, sharing one inversion
+        between all of the additions and doublings in the batch
+
+        Parameters:
+        Ps (list): Points from the curve
+        Qs (list): Points from the curve, as many as Ps
+
+        Returns:
+        list: The values of P + Q for each pair
+        """
+        p = self.p
+        sums = [None] * len(Ps)
+        todo = []
+        denominators = []
+        for i, (P, Q) in enumerate(zip(Ps, Qs)):
+            if P is INFINITY:
+                sums[i] = Q
+            elif Q is INFINITY:
+                sums[i] = P
+            elif P.x == Q.x:
+                if P.y != Q.y or P.y % p == 0:
+                    # P = -Q
+                    sums[i] = INFINITY
+                else:
+                    todo.append(i)
+                    denominators.append(2 * P.y)
+            else:
+                todo.append(i)
+                denominators.append(Q.x - P.x)
+
+        for i, inv in zip(todo, batch_inverse(denominators, p, self.inverse)):
+            P = Ps[i]
+            Q = Qs[i]
+            if P.x == Q.x:
+                z = ((3 * P.x * P.x + self.a) * inv) % p
+            else:
+                z = ((Q.y - P.y) * inv) % p
+            x3 = (z * z - P.x - Q.x) % p
+            y3 = (z * (P.x - x3) - P.y) % p
+            sums[i] = Point(x3, y3)
+        return sums
+
+    def batch_double(self, Ps):
+        """
+        Double many points, sharing one inversion between them
+
+        Parameters:
+        Ps (list): Points from the curve
+
+        Returns:
+        list: The values of 2P for each point
+        """
+        return self.batch_add(Ps, Ps)
+
+    def ECPointNegation(self, P):
+        """
+        Negate P, which on a curve of this form is just (x, -y)
+
+        Parameters:
+        P (Point): Point from the curve
+
+        Returns:
+        Point: The value of -P
+        """
+        if P is INFINITY:
+            return P
+        return Point(P.x, (-P.y) % self.p)
+
+    def to_jacobian(self, P):
+        """
+        Convert an affine point to Jacobian coordinates (X, Y, Z),
+        representing (X/Z**2, Y/Z**3). Infinity has Z = 0
+
+        Parameters:
+        P (Point): Point from the curve
+
+        Returns:
+        tuple: (X, Y, Z)
+        """
+        if P is INFINITY:
+            return (1, 1, 0)
+        return (P.x, P.y, 1)
+
+    def from_jacobian(self, J):
+        """
+        Convert a point in Jacobian coordinates back to an affine point,
+        this costs the one modular inversion
+
+        Parameters:
+        J (tuple): (X, Y, Z)
+
+        Returns:
+        Point: The affine point
+        """
+        X, Y, Z = J
+        if Z == 0:
+            return INFINITY
+        z = self.inverse(Z, self.p)
+        zz = (z * z) % self.p
+        return Point((X * zz) % self.p, (Y * zz * z) % self.p)
+
+    def batch_from_jacobian(self, Js):
+        """
+        Convert many points from Jacobian coordinates to affine points
+        sharing a single inversion
+
+        Parameters:
+        Js (list): Points as (X, Y, Z)
+
+        Returns:
+        list: The affine points
+        """
+        p = self.p
+        zs = batch_inverse([Z for _, _, Z in Js if Z != 0], p, self.inverse)
+        points = []
+        i = 0
+        for X, Y, Z in Js:
+            if Z == 0:
+                points.append(INFINITY)
+                continue
+            z = zs[i]
+            i += 1
+            zz = (z * z) % p
+            points.append(Point((X * zz) % p, (Y * zz * z) % p))
+        return points
+
+    def jacobian_double(self, J):
+        """
+        Double a point in Jacobian coordinates, no inversion needed
+
+        Parameters:
+        J (tuple): (X, Y, Z)
+
+        Returns:
+        tuple: 2J in Jacobian coordinates
+        """
+        X, Y, Z = J
+        if Z == 0 or Y == 0:
+            return (1, 1, 0)
+        p = self.p
+        YY = (Y * Y) % p
+        S = (4 * X * YY) % p
+        ZZ = (Z * Z) % p
+        M = (3 * X * X + self.a * ZZ * ZZ) % p
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YY * YY) % p
+        Z3 = (2 * Y * Z) % p
+        return (X3, Y3, Z3)
+
+    def jacobian_add(self, J1, J2):
+        """
+        Add two points in Jacobian coordinates, no inversion needed
+
+        Parameters:
+        J1 (tuple): (X1, Y1, Z1)
+        J2 (tuple): (X2, Y2, Z2)
+
+        Returns:
+        tuple: J1 + J2 in Jacobian coordinates
+        """
+        X1, Y1, Z1 = J1
+        X2, Y2, Z2 = J2
+        if Z1 == 0:
+            return J2
+        if Z2 == 0:
+            return J1
+        p = self.p
+        Z1Z1 = (Z1 * Z1) % p
+        Z2Z2 = (Z2 * Z2) % p
+        U1 = (X1 * Z2Z2) % p
+        U2 = (X2 * Z1Z1) % p
+        S1 = (Y1 * Z2 * Z2Z2) % p
+        S2 = (Y2 * Z1 * Z1Z1) % p
+        H = (U2 - U1) % p
+        r = (S2 - S1) % p
+        if H == 0:
+            # Same x, so either J1 = J2 or J1 = -J2
+            if r == 0:
+                return self.jacobian_double(J1)
+            return (1, 1, 0)
+        HH = (H * H) % p
+        HHH = (H * HH) % p
+        V = (U1 * HH) % p
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - S1 * HHH) % p
+        Z3 = (Z1 * Z2 * H) % p
+        return (X3, Y3, Z3)
+
+    def jacobian_mixed_add(self, J, Q):
+        """
+        Add an affine point to a point in Jacobian coordinates, cheaper
+        than jacobian_add as Q has Z = 1
+
+        Parameters:
+        J (tuple): (X1, Y1, Z1)
+        Q (Point): Point from the curve
+
+        Returns:
+        tuple: J + Q in Jacobian coordinates
+        """
+        if Q is INFINITY:
+            return J
+        X1, Y1, Z1 = J
+        if Z1 == 0:
+            return (Q.x, Q.y, 1)
+        p = self.p
+        Z1Z1 = (Z1 * Z1) % p
+        U2 = (Q.x * Z1Z1) % p
+        S2 = (Q.y * Z1 * Z1Z1) % p
+        H = (U2 - X1) % p
+        r = (S2 - Y1) % p
+        if H == 0:
+            if r == 0:
+                return self.jacobian_double(J)
+            return (1, 1, 0)
+        HH = (H * H) % p
+        HHH = (H * HH) % p
+        V = (X1 * HH) % p
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - Y1 * HHH) % p
+        Z3 = (Z1 * H) % p
+        return (X3, Y3, Z3)
+
+    def _group(self):
+        """
+        The group operations in the coordinate system chosen for this curve
+
+        Returns:
+        tuple: lift, drop, add, double, negate and the point at infinity
+        """
+        if self.coords == 'jacobian':
+            p = self.p
+            return (self.to_jacobian, self.from_jacobian, self.jacobian_add,
+                    self.jacobian_double, lambda J: (J[0], (-J[1]) % p, J[2]),
+                    (1, 1, 0))
+        return (lambda P: P, lambda P: P, self.ECPointAddition,
+                self.ECPointDoubling, self.ECPointNegation, INFINITY)
+
+    def _addends(self, table):
+        """
+        A precomputed table of points, from _group's coordinates, ready to
+        be added to a running total. In Jacobian coordinates the table is
+        made affine with one shared inversion, so that every addition is a
+        mixed addition
+
+        Parameters:
+        table (list): Points in the coordinates of _group
+
+        Returns:
+        list, function, function: The points, the addition of one of them
+            to a running total and their negation
+        """
+        if self.coords == 'jacobian':
+            return self.batch_from_jacobian(table), self.jacobian_mixed_add, self.ECPointNegation
+        return table, self.ECPointAddition, self.ECPointNegation
+
+    def ECPointMult(self, k, P, method=None, window=None):
         """
         Multiply P by k (quickly)
 
         Parameters:
         P (Point): Point from the curve
-        k (int): Scalar to multiply p by
+        k (int): Scalar to multiply p by, a negative k multiplies -P by -k
+        method (str): 'binary' or 'wnaf', defaults to the curve's choice
+        window (int): Window width for 'wnaf', defaults to the curve's choice
         
         Returns:
         Point: The value of kP
         """
-        sum = Point(self.p, self.p)
+        method = method or self.mult
+        if window is not None and window < 2:
+            raise ValueError(f"wNAF window must be at least 2, not {window}")
+        if k < 0:
+            k = -k
+            P = self.ECPointNegation(P)
+        if method == 'wnaf':
+            return self._wnaf_mult(k, P, window or self.window)
+        if method != 'binary':
+            raise ValueError(f"Unknown scalar multiplication method '{method}'")
+        if self.coords == 'jacobian':
+            return self._jacobian_mult(k, P)
+
+        sum = INFINITY
         X = P
         # Quick and dirty way to get the binary expansion of x
         f = format(k, 'b')[::-1]
@@ -149,6 +987,691 @@ class ECC():
             X = self.ECPointDoubling(X)
             
         return sum
+
+    def _jacobian_mult(self, k, P):
+        """
+        Left to right double and add in Jacobian coordinates, P is kept
+        affine so every addition is a mixed addition
+        """
+        R = (1, 1, 0)
+        for bit in format(k, 'b'):
+            R = self.jacobian_double(R)
+            if bit == '1':
+                R = self.jacobian_mixed_add(R, P)
+        return self.from_jacobian(R)
+
+    def _wnaf_mult(self, k, P, w):
+        """
+        Left to right wNAF multiplication using a table of the odd
+        multiples P, 3P, ..., (2**(w-1) - 1)P. Negative digits use the
+        negated table entry, which is free
+        """
+        lift, drop, add, double, neg, R = self._group()
+        X = lift(P)
+        X2 = double(X)
+        table = [X]
+        for _ in range((1 << (w - 2)) - 1):
+            table.append(add(table[-1], X2))
+        table, add, neg = self._addends(table)
+
+        for d in reversed(wNAF(k, w)):
+            R = double(R)
+            if d > 0:
+                R = add(R, table[d >> 1])
+            elif d < 0:
+                R = add(R, neg(table[(-d) >> 1]))
+        return drop(R)
+
+    def multi_scalar_mult(self, terms):
+        """
+        Compute k1*P1 + k2*P2 + ... sharing one chain of doublings, using
+        the joint sparse form for two terms and Pippenger's bucket method
+        for more
+
+        Parameters:
+        terms (list): (k, P) pairs of scalars and points from the curve
+
+        Returns:
+        Point: The sum of the k*P
+        """
+        lift, drop, add, double, neg, zero = self._group()
+        terms = [(k, P) if k >= 0 else (-k, self.ECPointNegation(P))
+                 for k, P in terms if k != 0]
+        if not terms:
+            return INFINITY
+        if len(terms) == 1:
+            return self.ECPointMult(*terms[0])
+        if len(terms) == 2:
+            return drop(self._jsf_mult(terms, lift, add, double, neg, zero))
+        return drop(self._pippenger_mult(terms, lift, add, double, zero))
+
+    def _jsf_mult(self, terms, lift, add, double, neg, R):
+        """
+        Shamir's trick over the joint sparse form, with P + Q and P - Q
+        precomputed so each non-zero column costs one addition
+        """
+        (k0, P0), (k1, P1) = terms
+        X0 = lift(P0)
+        X1 = lift(P1)
+        columns = [(1, 0), (0, 1), (1, 1), (1, -1)]
+        points, add_point, neg_point = self._addends(
+            [X0, X1, add(X0, X1), add(X0, neg(X1))])
+        table = dict(zip(columns, points))
+        for (u0, u1), X in list(table.items()):
+            table[(-u0, -u1)] = neg_point(X)
+
+        for u in reversed(JSF(k0, k1)):
+            R = double(R)
+            if u != (0, 0):
+                R = add_point(R, table[u])
+        return R
+
+    def _pippenger_mult(self, terms, lift, add, double, R):
+        """
+        Pippenger's bucket method, each window of c bits sorts the points
+        into 2**c - 1 buckets by digit and sums them with a running sum
+        """
+        bits = max(k.bit_length() for k, _ in terms)
+        c = max(2, len(terms).bit_length() - 1)
+        mask = (1 << c) - 1
+        points = [lift(P) for _, P in terms]
+
+        for shift in range(c * (-(-bits // c) - 1), -1, -c):
+            for _ in range(c):
+                R = double(R)
+            buckets = [None] * (mask + 1)
+            for (k, _), X in zip(terms, points):
+                j = (k >> shift) & mask
+                if j:
+                    buckets[j] = X if buckets[j] is None else add(buckets[j], X)
+            running = None
+            for j in range(mask, 0, -1):
+                if buckets[j] is not None:
+                    running = buckets[j] if running is None else add(running, buckets[j])
+                if running is not None:
+                    R = add(R, running)
+        return R
+
+    def random_point(self, rng=random):
+        """
+        A random point of the curve, from a random x with x**3 + ax + b
+        a square
+
+        Parameters:
+        rng (random.Random): Source of randomness
+
+        Returns:
+        Point: The point
+        """
+        p = self.p
+        while True:
+            x = rng.randrange(p)
+            rhs = (x * x * x + self.a * x + self.b) % p
+            if rhs == 0:
+                return Point(x, 0)
+            if pow(rhs, (p - 1) // 2, p) == 1:
+                y = sqrtModp(rhs, p)
+                return Point(x, y if rng.random() < 0.5 else p - y)
+
+    def point_order(self, P):
+        """
+        The order of P, from the group order by taking out each prime
+        factor while the rest of it still gives O
+
+        Parameters:
+        P (Point): Point from the curve
+
+        Returns:
+        int: The smallest n > 0 with nP = O
+        """
+        if P is INFINITY:
+            return 1
+        return self._strip_order(P, self.order())
+
+    def _hasse_multiple(self, P):
+        """
+        A multiple of the order of P. By Hasse's theorem (p + 1 - t)P = O
+        for some |t| <= 2 sqrt(p), and t is found by baby-step giant-step
+        on (p + 1)P = tP in about p**(1/4) additions
+
+        Parameters:
+        P (Point): Point from the curve, not O
+
+        Returns:
+        int: m > 0 with mP = O
+        """
+        p = self.p
+        bound = 2 * math.isqrt(p) + 2
+        m = math.isqrt(bound) + 1
+        # Baby steps jP for 1 <= j <= m by x, which also match -jP
+        baby = {}
+        X = P
+        for j in range(1, m + 1):
+            if X is INFINITY:
+                return j
+            baby.setdefault(X.x, (j, X.y))
+            X = self.ECPointAddition(X, P)
+        # Giant steps R = (p + 1 - is)P for |is| just beyond the bound,
+        # which is O or +-jP for t = is, is + j or is - j
+        s = 2 * m + 1
+        giants = bound // s + 1
+        step = self.ECPointNegation(self.ECPointMult(s, P))
+        R = self.ECPointMult(p + 1 + giants * s, P)
+        for i in range(-giants, giants + 1):
+            multiple = None
+            if R is INFINITY:
+                multiple = p + 1 - i * s
+            elif R.x in baby:
+                j, y = baby[R.x]
+                multiple = p + 1 - i * s + (-j if R.y == y else j)
+            if multiple and multiple > 0:
+                return multiple
+            R = self.ECPointAddition(R, step)
+        raise ValueError("P is not on the curve")
+
+    def _strip_order(self, P, multiple):
+        """
+        The order of P from a multiple of it
+        """
+        for q in factorise(multiple):
+            while multiple % q == 0 and self.ECPointMult(multiple // q, P) is INFINITY:
+                multiple //= q
+        return multiple
+
+    def twist(self):
+        """
+        The quadratic twist y**2 = x**3 + ag**2 x + bg**3 for g a non-square,
+        which has p + 1 + t points when this curve has p + 1 - t
+
+        Returns:
+        ECC: The twisted curve
+        """
+        p = self.p
+        g = 2
+        while pow(g, (p - 1) // 2, p) != p - 1:
+            g += 1
+        return ECC(p, self.a * g * g % p, self.b * g**3 % p,
+                   coords=self.coords, mult=self.mult, window=self.window)
+
+    def count_points(self):
+        """
+        The number of points including O, from the number of x for which
+        x**3 + ax + b is a square. Takes p steps, so only for small p
+        """
+        p = self.p
+        total = p + 1
+        for x in range(p):
+            rhs = (x * x * x + self.a * x + self.b) % p
+            if rhs:
+                total += 1 if pow(rhs, (p - 1) // 2, p) == 1 else -1
+        return total
+
+    def order(self, rng=random, method=None):
+        """
+        The number of points on the curve, worked out once and then kept.
+        By default small p count points, medium p use Mestre's method and
+        p from SCHOOF_MIN_P up use Schoof's algorithm
+
+        Parameters:
+        rng (random.Random): Source of the random points for Mestre
+        method (str): 'count', 'mestre' or 'schoof' to choose the method
+
+        Returns:
+        int: #E
+        """
+        if self._order is None or method is not None:
+            p = self.p
+            if method is None:
+                method = 'count' if p < 1 << 12 else 'mestre' if p < SCHOOF_MIN_P else 'schoof'
+            if method == 'count':
+                self._order = self.count_points()
+            elif method == 'mestre':
+                self._order = self._mestre_order(rng)
+            elif method == 'schoof':
+                self._order = self._schoof_order()
+            else:
+                raise ValueError(f"Unknown point counting method '{method}'")
+        return self._order
+
+    def _mestre_order(self, rng):
+        """
+        The order by Mestre's method. The order N is a multiple of the
+        order of every point, and 2p + 2 - N of every point of the twist,
+        so the lcms of the orders of a few random points of each leave one
+        candidate in the Hasse interval. Needs p > 229
+        """
+        p = self.p
+        low = p + 1 - math.isqrt(4 * p)
+        high = p + 1 + math.isqrt(4 * p)
+        twist = self.twist()
+        L = L_ = 1
+        while True:
+            X = self.random_point(rng)
+            m = self._strip_order(X, self._hasse_multiple(X))
+            L = L * m // math.gcd(L, m)
+            X = twist.random_point(rng)
+            m = twist._strip_order(X, twist._hasse_multiple(X))
+            L_ = L_ * m // math.gcd(L_, m)
+            # Solve N = 0 mod L, N = 2p + 2 mod L_, giving N mod lcm(L, L_)
+            g = math.gcd(L, L_)
+            M = L // g * L_
+            t = (2 * p + 2) // g * pow(L // g, -1, L_ // g) % (L_ // g)
+            N = low + (L * t - low) % M
+            if N + M > high:
+                return N
+
+    def division_polynomials(self, n):
+        """
+        The division polynomials psi_0 to psi_n as polynomials in x, with
+        the even ones divided by 2y, so that psi_l for odd l is the
+        polynomial whose roots are the x of the points of order l
+
+        Parameters:
+        n (int): The last one to find
+
+        Returns:
+        list: [psi_0, ..., psi_n] as coefficient lists
+        """
+        p = self.p
+        a, b = self.a % p, self.b % p
+        # (2y)**4 = 16 f**2
+        F2 = poly_mul([16 * b % p, 16 * a % p, 0, 16 % p], [b, a, 0, 1], p)
+        psi = [[], [1], [1],
+               poly_trim([(-a * a) % p, 12 * b % p, 6 * a % p, 0, 3]),
+               poly_trim([(-16 * b * b - 2 * a**3) % p, (-8 * a * b) % p, (-10 * a * a) % p,
+                          40 * b % p, 10 * a % p, 0, 2])]
+
+        def mul(*As):
+            R = [1]
+            for A in As:
+                R = poly_mul(R, A, p)
+            return R
+
+        for k in range(5, n + 1):
+            m = k // 2
+            if k % 2:
+                left = mul(psi[m + 2], psi[m], psi[m], psi[m])
+                right = mul(psi[m - 1], psi[m + 1], psi[m + 1], psi[m + 1])
+                if m % 2:
+                    right = poly_mul(right, F2, p)
+                else:
+                    left = poly_mul(left, F2, p)
+                psi.append(poly_sub(left, right, p))
+            else:
+                psi.append(poly_mul(psi[m], poly_sub(mul(psi[m + 2], psi[m - 1], psi[m - 1]),
+                                                     mul(psi[m - 2], psi[m + 1], psi[m + 1]), p), p))
+        return psi[:n + 1]
+
+    def _schoof_order(self):
+        """
+        The order by Schoof's algorithm: the trace t of Frobenius mod 2 and
+        mod small primes l, whose product is past 4 sqrt(p), gives t by
+        crt and so N = p + 1 - t
+        """
+        p = self.p
+        a, b = self.a % p, self.b % p
+        f = poly_trim([b, a, 0, 1])
+        # t is even iff there is a point of order 2, a root of f
+        ring = PolynomialRing(p, f)
+        g, _ = poly_xgcd(poly_sub(ring.pow([0, 1], p), [0, 1], p), f, p)
+        residues, moduli = [0 if len(g) > 1 else 1], [2]
+        ls, M, l = [], 2, 3
+        while M * M <= 16 * p:
+            if is_probable_prime(l) and l != p:
+                ls.append(l)
+                M *= l
+            l += 2
+        psi = self.division_polynomials(max(ls))
+        for l in ls:
+            modulus = psi[l]
+            while True:
+                try:
+                    residues.append(self._schoof_trace(PolynomialRing(p, modulus), l, f))
+                    break
+                except ZeroDivisor as e:
+                    # Carry on with only the l-torsion points over the factor
+                    modulus = e.factor
+            moduli.append(l)
+        t = crt(residues, moduli)
+        if t > M // 2:
+            t -= M
+        return p + 1 - t
+
+    def _schoof_trace(self, ring, l, f):
+        """
+        t mod l, from pi**2(P) + (p mod l)P = t pi(P) for the Frobenius
+        map pi(x, y) = (x**p, y**p) and P a point of order l, worked with
+        symbolically as (x, y) mod the l-th division polynomial or a factor
+        of it. Points are pairs (X, Y) standing for (X(x), Y(x) y), and O
+        is None
+        """
+        p = self.p
+        f = ring.reduce(f)
+        f2 = poly_add(f, f, p)
+
+        def add(P1, P2):
+            if P1 is None:
+                return P2
+            if P2 is None:
+                return P1
+            X1, Y1 = P1
+            X2, Y2 = P2
+            if X1 == X2:
+                if not poly_add(Y1, Y2, p):
+                    return None
+                if Y1 != Y2:
+                    # Equal for some points and opposite for others
+                    ring.inverse(poly_sub(Y1, Y2, p))
+                lam = ring.mul(poly_add(ring.mul([3], ring.mul(X1, X1)), [self.a % p], p),
+                               ring.inverse(ring.mul(Y1, f2)))
+            else:
+                lam = ring.mul(poly_sub(Y2, Y1, p), ring.inverse(poly_sub(X2, X1, p)))
+            X3 = poly_sub(poly_sub(ring.mul(f, ring.mul(lam, lam)), X1, p), X2, p)
+            Y3 = poly_sub(ring.mul(lam, poly_sub(X1, X3, p)), Y1, p)
+            return X3, Y3
+
+        def mult(k, P):
+            R = None
+            for bit in bin(k)[2:]:
+                R = add(R, R)
+                if bit == '1':
+                    R = add(R, P)
+            return R
+
+        X1 = ring.pow([0, 1], p)
+        Y1 = ring.pow(f, (p - 1) // 2)
+        X2 = ring.pow(X1, p)
+        Y2 = ring.mul(ring.pow(Y1, p), Y1)
+        S = add((X2, Y2), mult(p % l, (ring.reduce([0, 1]), [1])))
+        if S is None:
+            return 0
+        pi = (X1, Y1)
+        T = pi
+        for tau in range(1, (l + 1) // 2):
+            if T[0] == S[0]:
+                return tau if T[1] == S[1] else l - tau
+            T = add(T, pi)
+        raise ArithmeticError(f"No trace mod {l}, the curve may be singular")
+# %%
+class FixedBasePoint():
+    def __init__(self, E, P, window=4, n=None, bits=None):
+        """
+        Precompute multiples of a point that will be multiplied by many
+        different scalars. The table holds j * 2**(window*i) * P for every
+        window i and digit 1 <= j < 2**window, after which kP needs only
+        one addition per non-zero window of k
+
+        Parameters:
+        E (ECC): The curve to work on
+        P (Point): The base point
+        window (int): Bits per window, each extra bit roughly halves the
+            additions per multiplication and doubles the table size
+        n (int): The order of P, if known scalars are reduced mod n
+        bits (int): The largest scalar size to cover, defaults to the
+            size of n or of the largest possible group order
+
+        Returns:
+        FixedBasePoint: The precomputed base point
+        """
+        if window < 1:
+            raise ValueError(f"Window must be at least 1 bit, not {window}")
+        self.E = E
+        self.P = P
+        self.window = window
+        self.n = n
+        if bits is None:
+            bits = n.bit_length() if n else E.p.bit_length() + 1
+        self.bits = bits
+
+        # Build the table in Jacobian coordinates, then convert it all
+        # to affine points with one shared inversion
+        rows = []
+        base = E.to_jacobian(P)
+        for _ in range(-(-bits // window)):
+            row = [base]
+            for _ in range((1 << window) - 2):
+                row.append(E.jacobian_add(row[-1], base))
+            rows.append(row)
+            base = E.jacobian_add(row[-1], base)
+        points = E.batch_from_jacobian([J for row in rows for J in row])
+        width = (1 << window) - 1
+        self.table = [points[i:i+width] for i in range(0, len(points), width)]
+
+    def mult(self, k):
+        """
+        Multiply the base point by k using the table
+
+        Parameters:
+        k (int): Scalar to multiply P by
+
+        Returns:
+        Point: The value of kP
+        """
+        E = self.E
+        if self.n:
+            k = k % self.n
+        if k < 0:
+            return E.ECPointNegation(self.mult(-k))
+        if k >> self.bits:
+            return E.ECPointMult(k, self.P)
+
+        mask = (1 << self.window) - 1
+        if E.coords == 'jacobian':
+            R = (1, 1, 0)
+            for row in self.table:
+                if k & mask:
+                    R = E.jacobian_mixed_add(R, row[(k & mask) - 1])
+                k >>= self.window
+            return E.from_jacobian(R)
+
+        R = INFINITY
+        for row in self.table:
+            if k & mask:
+                R = E.ECPointAddition(R, row[(k & mask) - 1])
+            k >>= self.window
+        return R
+# %%
+class InstrumentedECC(ECC):
+    # Field multiplications and squarings of the general case of each
+    # formula, counted from the code above. Multiplying by a small constant
+    # is not counted, multiplying by a is
+    COSTS = {
+        'ECPointAddition': (2, 1),
+        'ECPointDoubling': (2, 2),
+        'jacobian_double': (4, 6),
+        'jacobian_add': (12, 4),
+        'jacobian_mixed_add': (8, 3),
+        'from_jacobian': (3, 1),
+    }
+    # Methods whose total cost, including everything they call, is kept
+    CALLS = ('ECPointMult', 'multi_scalar_mult', 'batch_add', 'batch_from_jacobian')
+
+    def __init__(self, p, a, b, coords='affine', mult='binary', window=4,
+                 inverse='pow', sites=False):
+        """
+        An ECC that counts the field multiplications (M), squarings (S)
+        and inversions (I) it does, giving the same results as ECC.
+
+        Each point operation is charged the cost of its formula, and every
+        call of the inverse backend is counted as an inversion of the
+        operation that made it. Scalar multiplications and batch
+        operations also keep their total cost including the operations
+        they call. With sites=True the cost of every call made from
+        outside the class is also kept against the line it was made from,
+        see cost_table
+
+        Parameters:
+        As for ECC, and
+        sites (bool): Keep a cost table by call site, which is slower
+
+        Returns:
+        InstrumentedECC: The curve
+        """
+        super().__init__(p, a, b, coords, mult, window, inverse)
+        self.sites = sites
+        self._inverse = self.inverse
+        self.inverse = self._counted_inverse
+        self.reset()
+
+    def reset(self):
+        """
+        Set every count back to zero
+        """
+        self.counts = {'M': 0, 'S': 0, 'I': 0}
+        # {name: {'calls', 'M', 'S', 'I'}}, the cost charged to each
+        # operation itself, and each of CALLS including what it called
+        self.ops = {}
+        self.calls = {}
+        # {(site, name): {'calls', 'M', 'S', 'I'}}
+        self.site_costs = {}
+        self._stack = []
+
+    def _charge(self, M=0, S=0, I=0):
+        counts = self.counts
+        counts['M'] += M
+        counts['S'] += S
+        counts['I'] += I
+        op = self.ops.setdefault(self._stack[-1] if self._stack else 'inverse',
+                                 {'calls': 0, 'M': 0, 'S': 0, 'I': 0})
+        op['M'] += M
+        op['S'] += S
+        op['I'] += I
+
+    def _counted_inverse(self, x, p):
+        self._charge(I=1)
+        return self._inverse(x, p)
+
+    def _run(self, name, method, args, M=0, S=0):
+        """
+        Call method(*args) as the operation `name`, charging it M and S
+        """
+        self.ops.setdefault(name, {'calls': 0, 'M': 0, 'S': 0, 'I': 0})['calls'] += 1
+        outer = self.sites and not self._stack
+        if outer:
+            frame = sys._getframe(2)
+            site = f"{frame.f_code.co_filename}:{frame.f_lineno} {frame.f_code.co_name}"
+        if name in self.CALLS or outer:
+            before = dict(self.counts)
+        self._stack.append(name)
+        try:
+            self._charge(M, S)
+            return method(*args)
+        finally:
+            self._stack.pop()
+            if name in self.CALLS:
+                self._add_cost(self.calls, name, before)
+            if outer:
+                self._add_cost(self.site_costs, (site, name), before)
+
+    def _add_cost(self, table, key, before):
+        cost = table.setdefault(key, {'calls': 0, 'M': 0, 'S': 0, 'I': 0})
+        cost['calls'] += 1
+        for k in ('M', 'S', 'I'):
+            cost[k] += self.counts[k] - before[k]
+
+    def snapshot(self):
+        """
+        A copy of every count, to compare with a later one using diff
+        """
+        return {
+            'counts': dict(self.counts),
+            'ops': {k: dict(v) for k, v in self.ops.items()},
+            'calls': {k: dict(v) for k, v in self.calls.items()},
+        }
+
+    @staticmethod
+    def diff(before, after):
+        """
+        The counts made between two snapshots, leaving out anything that
+        did not change
+        """
+        def subtract(a, b):
+            if not isinstance(a, dict):
+                return a - b
+            out = {}
+            for k, v in a.items():
+                change = subtract(v, b.get(k, {} if isinstance(v, dict) else 0))
+                if change:
+                    out[k] = change
+            return out
+        return subtract(after, before)
+
+    def cost_table(self, top=None):
+        """
+        The cost of the calls made from each line outside the class, most
+        expensive first, counting an inversion as 100 multiplications and
+        a squaring as 0.8 to order them. Needs sites=True
+
+        Returns:
+        str: The table
+        """
+        rows = sorted(self.site_costs.items(),
+                      key=lambda item: -(item[1]['M'] + 0.8 * item[1]['S'] + 100 * item[1]['I']))
+        lines = [f"{'call site':<50}{'method':>20}{'calls':>10}{'M':>12}{'S':>12}{'I':>10}"]
+        for (site, name), c in rows[:top]:
+            if len(site) > 49:
+                site = '...' + site[-46:]
+            lines.append(f"{site:<50}{name:>20}{c['calls']:>10}{c['M']:>12}{c['S']:>12}{c['I']:>10}")
+        return '\n'.join(lines)
+
+    def ECPointAddition(self, P, Q):
+        if P is INFINITY or Q is INFINITY or P.x == Q.x and P.y == (-Q.y) % self.p:
+            cost = (0, 0)
+        elif P == Q:
+            cost = self.COSTS['ECPointDoubling']
+        else:
+            cost = self.COSTS['ECPointAddition']
+        return self._run('ECPointAddition', super().ECPointAddition, (P, Q), *cost)
+
+    def ECPointDoubling(self, P):
+        if P is INFINITY or P.y % self.p == 0:
+            cost = (0, 0)
+        else:
+            cost = self.COSTS['ECPointDoubling']
+        return self._run('ECPointDoubling', super().ECPointDoubling, (P,), *cost)
+
+    def batch_add(self, Ps, Qs):
+        M = S = m = 0
+        for P, Q in zip(Ps, Qs):
+            if P is INFINITY or Q is INFINITY:
+                continue
+            if P.x != Q.x:
+                m += 1
+                M, S = M + 2, S + 1
+            elif P.y == Q.y and P.y % self.p != 0:
+                m += 1
+                M, S = M + 2, S + 2
+        # Montgomery's trick costs 3 multiplications per extra value
+        M += 3 * max(m - 1, 0)
+        return self._run('batch_add', super().batch_add, (Ps, Qs), M, S)
+
+    def from_jacobian(self, J):
+        cost = (0, 0) if J[2] == 0 else self.COSTS['from_jacobian']
+        return self._run('from_jacobian', super().from_jacobian, (J,), *cost)
+
+    def batch_from_jacobian(self, Js):
+        m = sum(1 for J in Js if J[2] != 0)
+        M, S = self.COSTS['from_jacobian']
+        return self._run('batch_from_jacobian', super().batch_from_jacobian, (Js,),
+                         m * M + 3 * max(m - 1, 0), m * S)
+
+    def jacobian_double(self, J):
+        cost = (0, 0) if J[2] == 0 or J[1] == 0 else self.COSTS['jacobian_double']
+        return self._run('jacobian_double', super().jacobian_double, (J,), *cost)
+
+    def jacobian_add(self, J1, J2):
+        cost = (0, 0) if J1[2] == 0 or J2[2] == 0 else self.COSTS['jacobian_add']
+        return self._run('jacobian_add', super().jacobian_add, (J1, J2), *cost)
+
+    def jacobian_mixed_add(self, J, Q):
+        cost = (0, 0) if Q is INFINITY or J[2] == 0 else self.COSTS['jacobian_mixed_add']
+        return self._run('jacobian_mixed_add', super().jacobian_mixed_add, (J, Q), *cost)
+
+    def ECPointMult(self, k, P, method=None, window=None):
+        return self._run('ECPointMult', super().ECPointMult, (k, P, method, window))
+
+    def multi_scalar_mult(self, terms):
+        return self._run('multi_scalar_mult', super().multi_scalar_mult, (terms,))
 # %% 
 """
 Binary digit manipulation functions
@@ -164,6 +1687,55 @@ def bits_to_bytes(bits):
     return b
 # %% 
 """
+# Random instances
+"""
+# %% 
+def random_prime(bits, rng=random):
+    """
+    A random prime of exactly `bits` bits
+    """
+    while True:
+        p = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+        if is_probable_prime(p):
+            return p
+
+
+def random_ECC_instance(bits, seed=None, cofactor_bits=8):
+    """
+    A random curve over a prime field of `bits` bits with a point P of
+    prime order n and Q = kP for a random k, in the form returned by
+    read_ECC_instance. Curves are drawn until the largest prime factor n
+    of the group order has at most `cofactor_bits` fewer bits than p
+
+    Parameters:
+    bits (int): Size of the field prime
+    seed (int): Seed for the curve, points and k, so instances can be
+        made again
+    cofactor_bits (int): How much smaller than p the order of P may be
+
+    Returns:
+    tuple: p, a, b, P, n, Q
+    """
+    rng = random.Random(seed)
+    while True:
+        p = random_prime(bits, rng)
+        a = rng.randrange(p)
+        b = rng.randrange(p)
+        if (4 * a**3 + 27 * b**2) % p == 0:
+            continue
+        E = ECC(p, a, b, coords='jacobian')
+        N = E.order(rng)
+        n = max(factorise(N))
+        if n.bit_length() < bits - cofactor_bits:
+            continue
+        # (N / n)X has order n unless it is O
+        P = INFINITY
+        while P is INFINITY:
+            P = E.ECPointMult(N // n, E.random_point(rng))
+        Q = E.ECPointMult(rng.randrange(1, n), P)
+        return p, a, b, P, n, Q
+# %% 
+"""
 # File input and output functions
 """
 # %% 
@@ -192,6 +1764,31 @@ def read_ECC_instance(filename):
     return p, a, b, P, n, Q
 
 
+def write_ECC_instance(p, a, b, P, n, Q, filename):
+    """
+    Write an instance in the format of exampleInputRho.txt, which
+    read_ECC_instance reads back
+    """
+    out_str = f"""# DISCLAIMER
+# This is an example of input for EC Pollard Rho
+# You may assume that the input is correct:
+# -- a, b do define an elliptic curve over GF(p)
+# -- P is a point on the curve
+# -- n is the order of P (the size of <P>)
+# -- Q is a multiple of P
+
+Input:
+p = {p}
+a = {a}
+b = {b}
+P = ({P.x}, {P.y})
+n = {n}
+Q = ({Q.x}, {Q.y})
+"""
+    with open(filename, 'w') as f:
+        f.write(out_str)
+
+
 def write_output(p, a, b, P, n, Q, c, d, c_, d_, filename):
     out_str = f"""# DISCLAIMER
 # Example of output for Basic Pollard Rho
@@ -0,0 +1,430 @@
+# %%
+"""
+# Benchmarks for the ECC code
+Run with `python benchmarks.py` from this directory, `--quick` for a short
+run and `--json FILE` to choose where the results are written
+"""
+# %%
+import argparse
+import datetime
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from ECC_utils import (ECC, InstrumentedECC, FixedBasePoint, Point, INVERSE_BACKENDS,
+                       random_ECC_instance, read_ECC_instance)
+import DLP_utils
+# %%
+"""
+# Benchmark instances
+"""
+# %%
+def benchmark_instances(sizes, seed=1, ecdh=True):
+    """
+    Generated instances for each field size, named by bits, and the ECDH
+    instance
+
+    Returns:
+    dict: {name: (p, a, b, P, n, Q)}
+    """
+    instances = {f"{bits} bit": random_ECC_instance(bits, seed + bits) for bits in sizes}
+    if ecdh:
+        instances['ECDH'] = ECDH_instance()
+    return instances
+
+
+# %%
+"""
+# Modular inverse backends
+"""
+# %%
+# Well known primes of increasing size, so no primality testing is needed
+BENCHMARK_PRIMES = {
+    16: 2**16 + 1,
+    32: 2**31 - 1,
+    64: 2**61 - 1,
+    128: 2**127 - 1,
+    256: 2**255 - 19,
+}
+
+
+def benchmark_inverses(count=2000, repeat=5, seed=1):
+    """
+    Time every modular inverse backend on random values for moduli of
+    16 to 256 bits
+
+    Parameters:
+    count (int): Inverses per timing run
+    repeat (int): Timing runs, the fastest is kept
+    seed (int): Seed for the random values
+
+    Returns:
+    dict: {(backend, bits): microseconds per inverse}
+    """
+    rng = random.Random(seed)
+    results = {}
+    for bits, p in BENCHMARK_PRIMES.items():
+        values = [rng.randrange(1, p) for _ in range(count)]
+        for name, inverse in INVERSE_BACKENDS.items():
+            t = min(timeit.repeat(lambda: [inverse(x, p) for x in values],
+                                  number=1, repeat=repeat))
+            results[(name, bits)] = t / count * 1e6
+    return results
+
+
+# %%
+"""
+# Point operation throughput
+"""
+# %%
+def benchmark_point_ops(instances, count=1000, repeat=3, seed=1):
+    """
+    Thousands of point operations per second for affine and Jacobian
+    addition and doubling and for each way of multiplying by a random
+    scalar below n
+
+    Parameters:
+    instances (dict): {name: (p, a, b, P, n, Q)}
+    count (int): Additions or doublings per timing run, scalar
+        multiplications are a twentieth of this
+    repeat (int): Timing runs, the fastest is kept
+    seed (int): Seed for the points and scalars
+
+    Returns:
+    dict: {(operation, instance name): thousand operations per second}
+    """
+    rng = random.Random(seed)
+    results = {}
+    for instance, (p, a, b, P, n, Q) in instances.items():
+        E = ECC(p, a, b, coords='jacobian')
+        mults = max(1, count // 20)
+        ks = [rng.randrange(1, n) for _ in range(count)]
+        # Distinct random multiples of P, so no addition is a doubling
+        Xs = [E.ECPointMult(k, P) for k in ks[:mults]] * (count // mults + 1)
+        pairs = [(X, Y) for X, Y in zip(Xs[:count], Xs[1:count + 1]) if X != Y]
+        Js = [E.to_jacobian(X) for X, _ in pairs]
+        affine = ECC(p, a, b, coords='affine')
+        wnaf = ECC(p, a, b, coords='jacobian', mult='wnaf')
+        fixed = FixedBasePoint(E, P, n=n)
+        ops = {
+            'add': (len(pairs), lambda: [E.ECPointAddition(X, Y) for X, Y in pairs]),
+            'double': (len(pairs), lambda: [E.ECPointDoubling(X) for X, _ in pairs]),
+            'jac add': (len(pairs), lambda: [E.jacobian_add(J, K) for J, K in zip(Js, Js[1:])]),
+            'jac double': (len(pairs), lambda: [E.jacobian_double(J) for J in Js]),
+            'mult aff': (mults, lambda: [affine.ECPointMult(k, P) for k in ks[:mults]]),
+            'mult jac': (mults, lambda: [E.ECPointMult(k, P) for k in ks[:mults]]),
+            'mult wnaf': (mults, lambda: [wnaf.ECPointMult(k, P) for k in ks[:mults]]),
+            'fixed P': (mults, lambda: [fixed.mult(k) for k in ks[:mults]]),
+        }
+        for name, (number, run) in ops.items():
+            t = min(timeit.repeat(run, number=1, repeat=repeat))
+            results[(name, instance)] = number / t / 1000
+    return results
+
+
+# %%
+"""
+# Field operations per scalar multiplication
+"""
+# %%
+def operation_counts(instance, scalars=20, seed=1):
+    """
+    The average field multiplications, squarings and inversions of one
+    ECPointMult for each coordinate system and scalar method, counted with
+    InstrumentedECC
+
+    Parameters:
+    instance (tuple): (p, a, b, P, n, Q)
+    scalars (int): Random scalars below n to average over
+    seed (int): Seed for the scalars
+
+    Returns:
+    dict: {(coords and method, 'M', 'S' or 'I'): count per multiplication}
+    """
+    p, a, b, P, n, Q = instance
+    rng = random.Random(seed)
+    ks = [rng.randrange(1, n) for _ in range(scalars)]
+    results = {}
+    for coords in ('affine', 'jacobian'):
+        for mult in ('binary', 'wnaf'):
+            E = InstrumentedECC(p, a, b, coords=coords, mult=mult)
+            for k in ks:
+                E.ECPointMult(k, P)
+            for op in ('M', 'S', 'I'):
+                results[(f"{coords[:3]} {mult}", op)] = E.counts[op] / scalars
+    return results
+
+
+# %%
+"""
+# Pollard Rho walk lengths
+"""
+# %%
+def ECDH_instance(q=None):
+    """
+    The ECDH instance from ../task/ECDH.txt with Q = QA. If q is given the
+    instance is moved into the subgroup of prime order q | n, which keeps
+    the curve and field but makes a rho run short enough to repeat
+
+    Returns:
+    tuple: p, a, b, P, n, Q
+    """
+    p = 20376993552394903
+    a = 10
+    b = 1
+    P = Point(1983, 6761152449250519)
+    n = 1852453970120513
+    Q = Point(18586784116581871, 12161036958498472)
+    if q is not None:
+        E = ECC(p, a, b, coords='jacobian')
+        P = E.ECPointMult(n // q, P)
+        Q = E.ECPointMult(n // q, Q)
+        n = q
+    return p, a, b, P, n, Q
+
+
+def walk_length(f, X, c, d):
+    """
+    The number of steps of the walk f before it first repeats a point,
+    found exactly by remembering every point (tail plus cycle length)
+    """
+    seen = set()
+    while X not in seen:
+        seen.add(X)
+        X, c, d = f(X, c, d)
+    return len(seen)
+
+
+def benchmark_walk_lengths(instances, walks, runs=50, seed=1):
+    """
+    Average walk length to the first repeated point for each walk, as a
+    multiple of the sqrt(pi n / 2) steps expected of a truly random walk
+
+    Parameters:
+    instances (dict): {name: (p, a, b, P, n, Q)}
+    walks (dict): {name: (walk, r)} as passed to DLP_utils.make_walk
+    runs (int): Runs per walk and instance, each with fresh random tables
+    seed (int): Seed for the starting points and walk tables
+
+    Returns:
+    dict: {(walk name, instance name): mean steps / sqrt(pi n / 2)}
+    """
+    random.seed(seed)
+    results = {}
+    for instance, (p, a, b, P, n, Q) in instances.items():
+        E = ECC(p, a, b)
+        expected = math.sqrt(math.pi * n / 2)
+        for name, (walk, r) in walks.items():
+            total = 0
+            for _ in range(runs):
+                f = DLP_utils.make_walk(E, P, Q, n, walk, r)
+                c = random.randrange(1, n)
+                d = random.randrange(1, n)
+                X = E.multi_scalar_mult([(c, P), (d, Q)])
+                total += walk_length(f, X, c, d)
+            results[(name, instance)] = total / runs / expected
+    return results
+
+
+# %%
+"""
+# Discrete log time to solution
+"""
+# %%
+def collision_log(E, P, Q, n, collide):
+    """
+    The log from a collision finder returning c, d, c_, d_, run again
+    while the collision is the useless d = d_ one
+    """
+    while True:
+        c, d, c_, d_ = collide()
+        if (d - d_) % n:
+            return DLP_utils.fullPollardRho(E, P, Q, n, c, d, c_, d_)
+
+
+# Every way of finding k s.t. Q = kP, as f(E, P, Q, n, seed, interval) where
+# the interval (a, b) holding k is only used by the kangaroo method
+STRATEGIES = {
+    'floyd': lambda E, P, Q, n, seed, interval: collision_log(
+        E, P, Q, n, lambda: DLP_utils.basicPollardRho(E, P, Q, n, 'floyd', 'partition')),
+    'brent': lambda E, P, Q, n, seed, interval: collision_log(
+        E, P, Q, n, lambda: DLP_utils.basicPollardRho(E, P, Q, n, 'brent', 'adding')),
+    'nivasch': lambda E, P, Q, n, seed, interval: collision_log(
+        E, P, Q, n, lambda: DLP_utils.basicPollardRho(E, P, Q, n, 'nivasch', 'adding')),
+    'negation': lambda E, P, Q, n, seed, interval: collision_log(
+        E, P, Q, n, lambda: DLP_utils.negationPollardRho(E, P, Q, n, seed=seed)),
+    'multi-walk': lambda E, P, Q, n, seed, interval: collision_log(
+        E, P, Q, n, lambda: DLP_utils.multiWalkPollardRho(E, P, Q, n, seed=seed)),
+    'parallel': lambda E, P, Q, n, seed, interval: collision_log(
+        E, P, Q, n, lambda: DLP_utils.parallelPollardRho(E, P, Q, n, seed=seed)),
+    'multi-target': lambda E, P, Q, n, seed, interval:
+        DLP_utils.multiTargetPollardRho(E, P, [Q], n, seed=seed)[0],
+    'BSGS': lambda E, P, Q, n, seed, interval: DLP_utils.babyStepGiantStep(E, P, Q, n),
+    'kangaroo': lambda E, P, Q, n, seed, interval: DLP_utils.pollardKangaroo(
+        E, P, Q, *interval, n=n),
+    'Pohlig-Hellman': lambda E, P, Q, n, seed, interval:
+        DLP_utils.pohligHellman(E, P, Q, n, seed=seed),
+}
+
+
+def benchmark_rho(instances, strategies, runs=3, seed=1):
+    """
+    Median milliseconds to find the discrete log for each strategy, checking
+    every answer. Each run uses a new Q = kP so the walks differ, and the
+    interval given for k is n / 8 wide, well below the order as the
+    kangaroo method needs
+
+    Parameters:
+    instances (dict): {name: (p, a, b, P, n, Q)}
+    strategies (dict): {name: f(E, P, Q, n, seed, interval)} as in STRATEGIES
+    runs (int): Runs per strategy and instance
+    seed (int): Seed for the targets and the walks
+
+    Returns:
+    dict: {(strategy, instance name): median milliseconds}
+    """
+    rng = random.Random(seed)
+    results = {}
+    for instance, (p, a, b, P, n, Q) in instances.items():
+        E = ECC(p, a, b, coords='jacobian')
+        width = n // 8
+        targets = []
+        for _ in range(runs):
+            k = rng.randrange(1, n)
+            low = max(0, k - rng.randrange(width + 1))
+            targets.append((k, rng.randrange(2**32), (low, low + width)))
+        for name, solve in strategies.items():
+            times = []
+            for k, walk_seed, interval in targets:
+                Q = E.ECPointMult(k, P)
+                random.seed(walk_seed)
+                start = time.perf_counter()
+                found = solve(E, P, Q, n, walk_seed, interval)
+                times.append(time.perf_counter() - start)
+                if found is None or E.ECPointMult(found, P) != Q:
+                    raise AssertionError(f"{name} gave k = {found} on {instance}, not {k}")
+            results[(name, instance)] = statistics.median(times) * 1000
+    return results
+
+
+# %%
+"""
+# Output
+"""
+# %%
+def print_table(results, title):
+    """
+    Print {(row, column): value} results as a table, with - for pairs that
+    were not measured
+    """
+    rows = list(dict.fromkeys(r for r, _ in results))
+    columns = list(dict.fromkeys(c for _, c in results))
+    width = max([10] + [len(str(r)) + 1 for r in rows])
+    print(title)
+    print(f"{'':>{width}}" + "".join(f"{c:>10}" for c in columns))
+    for r in rows:
+        print(f"{r:>{width}}" + "".join(f"{results[(r, c)]:>10.2f}" if (r, c) in results
+                                        else f"{'-':>10}" for c in columns))
+    print()
+
+
+def git_commit():
+    """
+    The commit being benchmarked, or None outside a git checkout
+    """
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def write_results(filename, tables, instances):
+    """
+    Write every table as JSON records, along with the instances and what
+    they were run on, so runs from different commits can be compared
+
+    Parameters:
+    filename (str): File to write
+    tables (dict): {title: (unit, {(row, column): value})}
+    instances (dict): {name: (p, a, b, P, n, Q)}
+    """
+    records = [{'benchmark': title, 'row': str(r), 'column': str(c), 'value': value, 'unit': unit}
+               for title, (unit, results) in tables.items()
+               for (r, c), value in results.items()]
+    output = {
+        'meta': {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': sys.version,
+            'platform': platform.platform(),
+            'argv': sys.argv[1:],
+        },
+        'instances': {name: {'p': p, 'a': a, 'b': b, 'P': [P.x, P.y], 'n': n, 'Q': [Q.x, Q.y]}
+                      for name, (p, a, b, P, n, Q) in instances.items()},
+        'results': records,
+    }
+    with open(filename, 'w') as f:
+        json.dump(output, f, indent=1)
+# %%
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the ECC and discrete log code")
+    parser.add_argument('--quick', action='store_true', help="fewer sizes and runs")
+    parser.add_argument('--ecdh', action='store_true',
+                        help="also measure walk lengths on the full ECDH order")
+    parser.add_argument('--json', default='benchmark_results.json',
+                        help="file for the machine-readable results")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sizes = (16, 32) if args.quick else (16, 32, 48, 64)
+    rho_sizes = (20, 28) if args.quick else (24, 32, 40)
+    runs = 1 if args.quick else 3
+    tables = {}
+
+    def report(results, title, unit):
+        print_table(results, title)
+        tables[title] = (unit, results)
+
+    report(benchmark_inverses(repeat=2 if args.quick else 5, seed=args.seed),
+           "Modular inverse, microseconds per call, by modulus bits", 'microseconds')
+    report(operation_counts(ECDH_instance(), seed=args.seed),
+           "Field operations per ECPointMult on the ECDH curve", 'operations')
+
+    instances = benchmark_instances(sizes, args.seed)
+    report(benchmark_point_ops(instances, count=200 if args.quick else 1000, seed=args.seed),
+           "Point operations, thousands per second", 'kops/s')
+
+    rho_instances = benchmark_instances(rho_sizes, args.seed, ecdh=False)
+    rho_instances['ECDH q'] = ECDH_instance(q=46779827)
+    times = benchmark_rho(rho_instances, STRATEGIES, runs, args.seed)
+    # Only Pohlig-Hellman is quick on the full ECDH order, the rest need
+    # sqrt(n) ~ 4e7 steps
+    times.update(benchmark_rho({'ECDH': ECDH_instance()},
+                               {'Pohlig-Hellman': STRATEGIES['Pohlig-Hellman']}, runs, args.seed))
+    report(times, "Discrete log, median milliseconds to solution", 'milliseconds')
+
+    walk_instances = {
+        'example': read_ECC_instance('exampleInputRho.txt'),
+        'ECDH q': ECDH_instance(q=46779827),
+    }
+    # The full ECDH order needs ~5e7 stored points per run, only on request
+    if args.ecdh:
+        walk_instances['ECDH'] = ECDH_instance()
+    walks = {
+        'x mod 3': ('partition', None),
+        'r = 16': ('adding', 16),
+        'r = 32': ('adding', 32),
+    }
+    report(benchmark_walk_lengths(walk_instances, walks, runs=10 if args.quick else 50,
+                                  seed=args.seed),
+           "Pollard Rho steps to the first repeated point / sqrt(pi n / 2)", 'sqrt(pi n / 2)')
+
+    write_results(args.json, tables, {**instances, **rho_instances, **walk_instances})
+    print(f"Results written to {args.json}")
@@ -0,0 +1,32 @@
+# %%
+"""
+# Generate ECDLP instances
+Writes random instances in the format of exampleInputRho.txt, for example
+`python generate_instances.py 40 --count 200 --dir instances` from this
+directory. The same seed always gives the same files
+"""
+# %%
+import argparse
+import os
+import time
+
+from ECC_utils import random_ECC_instance, write_ECC_instance
+# %%
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate random ECDLP instances")
+    parser.add_argument('bits', type=int, nargs='+', help="sizes of the field prime")
+    parser.add_argument('--count', type=int, default=10, help="instances per size")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the first instance")
+    parser.add_argument('--cofactor-bits', type=int, default=8,
+                        help="how much smaller than p the order of P may be")
+    parser.add_argument('--dir', default='instances', help="directory to write to")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    for bits in args.bits:
+        start = time.time()
+        for i in range(args.count):
+            # One seed per file, so any instance can be made again alone
+            instance = random_ECC_instance(bits, args.seed + i, args.cofactor_bits)
+            write_ECC_instance(*instance, os.path.join(args.dir, f"input_{bits}_{args.seed + i}.txt"))
+        print(f"{args.count} instances of {bits} bits in {time.time() - start:.1f}s")
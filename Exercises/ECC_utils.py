@@ -19,24 +19,31 @@ E defined over K=GF(p) is the collection of points (x,y) in K2 such that
 """
 
 # %%
-def EEA(a,b):
-    r = [a, b]
-    q = [0, 0]
-    s = [1, 0]
-    t = [0, 1]
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-    i = 1 
+# Below this x**3 + ax + b fits in an int64 without overflow
+NUMPY_MAX_P = 2**26
+# %%
+def EEA(a,b):
+    # Only the last two remainders and coefficients are ever needed
+    r0, r1 = a, b
+    s0, s1 = 1, 0
+    t0, t1 = 0, 1
 
-    while r[i] > 0:
-        i = i + 1
-        q.append( r[i-2] // r[i-1] )
-        r.append( r[i-2] - q[i] * r[i-1] )
-        s.append( s[i-2] - q[i] * s[i-1] )
-        t.append( t[i-2] - q[i] * t[i-1] )
+    while r1 > 0:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        s0, s1 = s1, s0 - q * s1
+        t0, t1 = t1, t0 - q * t1
 
     #      gcd      x       y
     # s.t. ax + by = gcd
-    return(r[i-1], s[i-1], t[i-1])
+    return(r0, s0, t0)
 
 
 def inverseModp(x, p):
@@ -44,28 +51,35 @@ def inverseModp(x, p):
     (r, s, t) = EEA(p, y)
     return t % p
 # %% 
+from collections import namedtuple
 
-class Point():
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
 
-    def __eq__(self, other):
-        if self.x == other.x and self.y == other.y:
-            return True
-        else:
-            return False
-        
-    def __neq__(self, other):
-        return not self.__eq__(other)
+class Point(namedtuple('Point', ['x', 'y'])):
+    """
+    An affine point (x, y), stored as an immutable tuple so that points
+    are small, hashable and compare quickly. The point at infinity is the
+    single object INFINITY, check for it with `P is INFINITY`
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        # Keep INFINITY a singleton when pickled, e.g. between processes
+        if self is INFINITY:
+            return 'INFINITY'
+        return (Point, tuple(self))
 
     def __str__(self):
+        if self is INFINITY:
+            return "O"
         return f"({self.x}, {self.y})"
 
     def __repr__(self):
         return str(self)
 
 
+INFINITY = Point(None, None)
+
+
 class ECC():
     def __init__(self, p, a, b):
         self.p = p
@@ -77,19 +91,16 @@ class ECC():
 
     def ECPointAddition(self, P, Q):
         # If P is infinity, return Q
-        if (P.x, P.y) == (self.p, self.p):
+        if P is INFINITY:
             return Q
-        # If Q is infinity, return infinity
-        if (Q.x, Q.y) == (self.p, self.p):
+        # If Q is infinity, return P
+        if Q is INFINITY:
             return P
         # If P = -Q, return infinity
         if P.x == Q.x and P.y == (-Q.y) % self.p:
-            return Point(self.p, self.p)
-        # If P = -Q
-        if (P.x, P.y) == (Q.x, Q.y) and P.y == 0:
-            return Point(self.p, self.p)
-        # 2P, for P != P
-        if (P.x, P.y) == (Q.x, Q.y) and P.y != 0:
+            return INFINITY
+        # 2P, for P != -P
+        if P == Q:
             z = (3 * P.x**2 + self.a) * inverseModp(2*P.y, self.p)
             x3 = (z**2 - 2*P.x) % self.p
             y3 = (z*(P.x - x3) - P.y) % self.p
@@ -101,8 +112,8 @@ class ECC():
             return Point(x3, y3)
 
     def ECPointDoubling(self, P):
-        if P.y == -P.y:
-            return Point(self.p, self.p)
+        if P is INFINITY or P.y % self.p == 0:
+            return INFINITY
         else:
             z = ( (3*(P.x**2)%self.p + self.a) * inverseModp( 2*P.y, self.p ) ) % self.p
             x3 = ( (z**2) - 2*P.x ) % self.p
@@ -110,11 +121,11 @@ class ECC():
             return Point(x3, y3)
 
     def points_from_P(self, P):
-        Points = [ (0, Point(self.p, self.p)), (1, P) ]
+        Points = [ (0, INFINITY), (1, P) ]
 
         k = 1
-        Q = Point(P.x, P.y)
-        while Q.x != self.p and Q.y != self.p: # and k <= 4000:
+        Q = P
+        while Q is not INFINITY: # and k <= 4000:
             k = k + 1
             Q = self.ECPointAddition(P, Q)
             Points.append( (k, Q) )
@@ -124,7 +135,7 @@ class ECC():
 
     def scalarMultP(self, k, P):
         if k == 0:
-            return Point(self.p, self.p)
+            return INFINITY
         if k == 1:
             return P
         else:
@@ -135,23 +146,101 @@ class ECC():
                 Q = self.ECPointAddition(Q, P)
             return Q
 
-    def curve(self):
-        discriminant = ( 4 * (self.a ** 3) + 27 * (self.b ** 2) ) % self.p
+    def curve(self, chunk=2**16):
+        """
+        Every point of the curve, found by taking square roots of
+        x**3 + ax + b for all x. With NumPy and p below NUMPY_MAX_P this is
+        done a chunk of x at a time from a table of square roots
+
+        Parameters:
+        chunk (int): x values per NumPy step, bounding the temporary arrays
+
+        Returns:
+        int, array, array: #E including O, then the x and y of every
+            affine point, ordered by x then y
+        """
+        p = self.p
+        discriminant = ( 4 * (self.a ** 3) + 27 * (self.b ** 2) ) % p
         if discriminant == 0:
             raise Exception("discriminant = 0, invalid curve")
-        
-        curve = [ Point(self.p, self.p) ]
-        
-        xcurve = []
-        for x in range(self.p):
-            xonthecurve = (x**3 + self.a*x + self.b) % self.p
-            xcurve.append( (x, xonthecurve) )
-        
-        ycurve = []
-        for y in range(self.p):
-            yonthecurve = ( y**2 ) % self.p
-            ycurve.append( (y, yonthecurve) )
-
-        xcurve.sort(key=lambda x: x[1])
-
-        # TODO FINISH THIS METHOD
\ No newline at end of file
+        if np is None or p >= NUMPY_MAX_P:
+            return self._curve_python()
+
+        a, b = self.a % p, self.b % p
+        # roots[s] is the root y <= p/2 of s if s is a square, else -1
+        roots = np.full(p, -1, dtype=np.int32)
+        y = np.arange((p + 1) // 2, dtype=np.int64)
+        roots[y * y % p] = y
+
+        xs, ys = [], []
+        for start in range(0, p, chunk):
+            x = np.arange(start, min(start + chunk, p), dtype=np.int64)
+            rhs = ((x * x % p) * x + a * x + b) % p
+            r = roots[rhs]
+            found = r >= 0
+            x, r = x[found], r[found].astype(np.int64)
+            # Each x gives (x, y) and, unless y = 0, (x, p - y) after it
+            counts = 1 + (r != 0)
+            ends = np.cumsum(counts)
+            x = np.repeat(x, counts)
+            r = np.repeat(r, counts)
+            r[ends[counts == 2] - 1] *= -1
+            xs.append(x)
+            ys.append(r % p)
+        xs = np.concatenate(xs)
+        ys = np.concatenate(ys)
+        return len(xs) + 1, xs, ys
+
+    def _curve_python(self):
+        """
+        curve() without NumPy, with the square roots in a dict
+        """
+        p = self.p
+        roots = {}
+        for y in range((p + 1) // 2):
+            roots[y * y % p] = y
+        xs, ys = array('q'), array('q')
+        for x in range(p):
+            y = roots.get((x**3 + self.a*x + self.b) % p)
+            if y is not None:
+                xs.append(x)
+                ys.append(y)
+                if y:
+                    xs.append(x)
+                    ys.append(p - y)
+        return len(xs) + 1, xs, ys
+
+    def count_points(self, chunk=2**16):
+        """
+        #E including O, from the number of x with x**3 + ax + b a square.
+        With NumPy and p below NUMPY_MAX_P the squares are marked in a p
+        byte table, as curve() does with its roots. Otherwise each value is
+        tested by Euler's criterion, which needs no table at all
+
+        Parameters:
+        chunk (int): x values per NumPy step
+
+        Returns:
+        int: #E
+        """
+        p = self.p
+        if np is None or p >= NUMPY_MAX_P:
+            total = p + 1
+            for x in range(p):
+                s = (x**3 + self.a*x + self.b) % p
+                if s:
+                    total += 1 if pow(s, (p - 1) // 2, p) == 1 else -1
+            return total
+
+        a, b = self.a % p, self.b % p
+        squares = np.zeros(p, dtype=bool)
+        y = np.arange((p + 1) // 2, dtype=np.int64)
+        squares[y * y % p] = True
+
+        total = 1
+        for start in range(0, p, chunk):
+            x = np.arange(start, min(start + chunk, p), dtype=np.int64)
+            rhs = ((x * x % p) * x + a * x + b) % p
+            # Two points for each nonzero square, one for rhs = 0
+            total += 2 * int(np.count_nonzero(squares[rhs])) - int(np.count_nonzero(rhs == 0))
+        return total
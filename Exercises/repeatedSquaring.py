@@ -19,21 +19,18 @@ def repeatedSquaring(y,x,n):
 
 # The EEA, useful to find inverses mod n
 def EEA(a,b):
-    r = [a, b]
-    q = [0, 0]
-    s = [1, 0]
-    t = [0, 1]
-
-    i = 1 
-
-    while r[i] > 0:
-        i = i + 1
-        q.append( r[i-2] // r[i-1] )
-        r.append( r[i-2] - q[i] * r[i-1] )
-        s.append( s[i-2] - q[i] * s[i-1] )
-        t.append( t[i-2] - q[i] * t[i-1] )
-
-    return(r[i-1], s[i-1], t[i-1])
+    # Only the last two remainders and coefficients are ever needed
+    r0, r1 = a, b
+    s0, s1 = 1, 0
+    t0, t1 = 0, 1
+
+    while r1 > 0:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        s0, s1 = s1, s0 - q * s1
+        t0, t1 = t1, t0 - q * t1
+
+    return(r0, s0, t0)
 
 
         